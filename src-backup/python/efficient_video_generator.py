@@ -12,13 +12,12 @@ import os
 import tempfile
 import shutil
 import subprocess
-from pathlib import Path
-from typing import List, Dict, Tuple
-import cv2
+from typing import List, Dict
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 import librosa
-import soundfile as sf
+
+from ffmpeg_escape import escape_filtergraph, escape_option_value, escape_sendcmd_arg
 
 # Set up logging
 logging.basicConfig(
@@ -27,11 +26,19 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 'inline': one drawtext filter per word chained into the -filter_complex argument (default)
+# 'sendcmd': one drawtext instance driven by a sendcmd timeline, graph passed via -filter_complex_script
+CAPTION_MODES = ('inline', 'sendcmd')
+
 class EfficientVideoGenerator:
-    def __init__(self, video_id: str):
+    def __init__(self, video_id: str, caption_mode: str = 'inline'):
         self.video_id = video_id
         self.temp_files = []
         self.temp_dirs = []
+        if caption_mode not in CAPTION_MODES:
+            logger.warning(f"Unknown caption mode '{caption_mode}', using inline")
+            caption_mode = 'inline'
+        self.caption_mode = caption_mode
         
     def cleanup(self):
         """Clean up temporary files and directories"""
@@ -47,6 +54,13 @@ class EfficientVideoGenerator:
             except:
                 pass
 
+    def make_temp_file(self, suffix: str) -> str:
+        """Create a temp file that is removed by cleanup()"""
+        fd, path = tempfile.mkstemp(prefix=f'efficient_video_{self.video_id}_', suffix=suffix)
+        os.close(fd)
+        self.temp_files.append(path)
+        return path
+
     def get_word_timestamps_simple(self, audio_path: str, text: str) -> List[Dict]:
         """
         Get word timestamps using a simple approach (similar to FullyAutomatedRedditVideoMakerBot)
@@ -145,6 +159,53 @@ class EfficientVideoGenerator:
         
         return ','.join(filter_parts)
 
+    def create_dyslexic_captions_sendcmd(self, word_timestamps: List[Dict],
+                                         opening_duration: float, commands_path: str) -> str:
+        """
+        Create the same dyslexic-style captions with a single drawtext instance.
+        Word changes are written to a sendcmd timeline at `commands_path`, so the
+        per-frame filter cost does not grow with the number of words.
+        """
+        commands = []
+        for i, word in enumerate(word_timestamps):
+            start_time = opening_duration + word['start']
+            end_time = opening_duration + word['end']
+            duration = end_time - start_time
+            if duration <= 0:
+                continue
+            
+            # Animation parameters
+            fade_in_duration = min(0.2, duration * 0.3)
+            fade_out_duration = min(0.2, duration * 0.3)
+            
+            # Font size based on emphasis
+            font_size = 90 if word['emphasis'] else 75
+            
+            alpha = (
+                f"if(lt(t,{start_time + fade_in_duration:.3f}),(t-{start_time:.3f})/{fade_in_duration:.3f},"
+                f"if(gt(t,{end_time - fade_out_duration:.3f}),({end_time:.3f}-t)/{fade_out_duration:.3f},1))"
+            )
+            options = (
+                f"text={escape_option_value(word['text'].upper())}:fontsize={font_size}"
+                f":alpha={escape_option_value(alpha)}:box=1"
+            )
+            commands.append(f"{start_time:.3f} drawtext@captions reinit {escape_sendcmd_arg(options)};")
+            
+            # Hide the caption in gaps between words
+            next_start = opening_duration + word_timestamps[i + 1]['start'] if i + 1 < len(word_timestamps) else None
+            if next_start is None or next_start > end_time:
+                commands.append(f"{end_time:.3f} drawtext@captions reinit alpha=0:box=0;")
+        
+        with open(commands_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(commands) + '\n')
+        
+        return (
+            f"sendcmd=f={escape_filtergraph(escape_option_value(commands_path))},"
+            f"drawtext@captions=text=.:expansion=none:fontsize=75:fontcolor=white"
+            f":x=(w-text_w)/2:y=h-350:alpha=0:box=0:boxcolor=black@0.8:boxborderw=12"
+            f":shadowx=4:shadowy=4:shadowcolor=black@0.9"
+        )
+
     def generate_video_ffmpeg(self, background_path: str, banner_path: str,
                              opening_audio: str, story_audio: str,
                              output_path: str, opening_duration: float,
@@ -172,7 +233,11 @@ class EfficientVideoGenerator:
             
             # Add dyslexic captions
             if word_timestamps:
-                captions_filter = self.create_dyslexic_captions_ffmpeg(word_timestamps, opening_duration)
+                if self.caption_mode == 'sendcmd':
+                    commands_path = self.make_temp_file('.cmd')
+                    captions_filter = self.create_dyslexic_captions_sendcmd(word_timestamps, opening_duration, commands_path)
+                else:
+                    captions_filter = self.create_dyslexic_captions_ffmpeg(word_timestamps, opening_duration)
                 filter_complex += f"[with_banner]{captions_filter}[with_captions];"
                 video_output = "[with_captions]"
             else:
@@ -185,8 +250,16 @@ class EfficientVideoGenerator:
                 [opening_audio][story_audio]concat=n=2:v=0:a=1[final_audio]
             """
             
+            if self.caption_mode == 'sendcmd':
+                # Pass the graph through a script file so long stories don't hit argv length limits
+                script_path = self.make_temp_file('.txt')
+                with open(script_path, 'w', encoding='utf-8') as f:
+                    f.write(filter_complex.strip())
+                cmd.extend(['-filter_complex_script', script_path])
+            else:
+                cmd.extend(['-filter_complex', filter_complex.strip()])
+            
             cmd.extend([
-                '-filter_complex', filter_complex.strip(),
                 '-map', video_output,
                 '-map', '[final_audio]',
                 '-c:v', 'libx264',
@@ -348,7 +421,7 @@ def main():
         story_data = json.loads(story_data_json)
         
         # Create generator
-        generator = EfficientVideoGenerator(video_id)
+        generator = EfficientVideoGenerator(video_id, caption_mode=os.environ.get('FFMPEG_CAPTION_MODE', 'inline'))
         
         # Generate video
         generator.generate(
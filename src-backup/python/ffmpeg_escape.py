@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""
+Escaping for text placed in FFmpeg filtergraphs, shared by the FFmpeg
+caption generators.
+"""
+
+
+def escape_option_value(value: str) -> str:
+    """Escape a value inside a filter option string (key=value:key=value)"""
+    return value.replace('\\', '\\\\').replace("'", "\\'").replace(':', '\\:')
+
+
+def escape_filtergraph(value: str) -> str:
+    """Escape filter arguments for the filtergraph parser"""
+    return ''.join('\\' + c if c in "\\'[],;" else c for c in value)
+
+
+def escape_sendcmd_arg(value: str) -> str:
+    """Escape a command argument in a sendcmd file (arguments end at ',', ';' or newline)"""
+    return ''.join('\\' + c if c in "\\',;" else c for c in value)
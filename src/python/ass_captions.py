@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Advanced SubStation Alpha (ASS) caption backend.
+
+Writes the word alignment as an ASS script (one event per word, with the
+pop-in bounce expressed as a `\\t` scale transform) so FFmpeg's `ass` filter
+(libass) can burn the captions in during the encode, instead of compositing
+them frame by frame in Python.
+"""
+
+import logging
+import os
+from typing import List, Optional, Tuple
+
+from PIL import ImageColor
+
+from caption_track import BOUNCE_DURATION, BOUNCE_SCALE
+from font_registry import DEFAULT_FONT_CANDIDATES, get_font
+
+logger = logging.getLogger(__name__)
+
+
+def ass_timestamp(seconds: float) -> str:
+    """Format seconds as an ASS timestamp (H:MM:SS.cc)."""
+    cs = int(round(max(0.0, seconds) * 100))
+    h, cs = divmod(cs, 360000)
+    m, cs = divmod(cs, 6000)
+    s, cs = divmod(cs, 100)
+    return f"{h}:{m:02d}:{s:02d}.{cs:02d}"
+
+
+def ass_color(color: str, alpha: int = 0) -> str:
+    """Convert a CSS/hex color to ASS &HAABBGGRR (alpha 0 = opaque)."""
+    r, g, b = ImageColor.getrgb(color)[:3]
+    return f"&H{alpha:02X}{b:02X}{g:02X}{r:02X}"
+
+
+def escape_ass_text(text: str) -> str:
+    """Escape characters that libass would treat as override blocks or line breaks."""
+    return text.replace('\\', '\\\\').replace('{', '\\{').replace('}', '\\}').replace('\n', ' ')
+
+
+def escape_option_value(value: str) -> str:
+    """Escape a value inside a filter option string (key=value:key=value)."""
+    return value.replace('\\', '\\\\').replace("'", "\\'").replace(':', '\\:')
+
+
+def escape_filtergraph(value: str) -> str:
+    """Escape filter arguments for the filtergraph parser."""
+    return ''.join('\\' + c if c in "\\'[],;" else c for c in value)
+
+
+def escape_filter_path(path: str) -> str:
+    """
+    Escape a path for use as an option value of a filter in a -vf/-filter_complex
+    graph: first for the filter's option parser, then for the graph parser.
+    """
+    return escape_filtergraph(escape_option_value(path.replace('\\', '/')))
+
+
+def caption_font(style: dict, candidates: Optional[Tuple[str, ...]] = None):
+    """Return (family_name, bold, fontsdir, ass_font_size) matching the Pillow caption font."""
+    font_size = style.get('fontSize', 75)
+    font, font_path = get_font(font_size, candidates or DEFAULT_FONT_CANDIDATES)
+    if font_path is None:
+        return 'Arial', True, None, font_size
+    family, face = font.getname()
+    # libass sizes a font by its ascent + descent, Pillow by its em size
+    ascent, descent = font.getmetrics()
+    return family or 'Arial', 'bold' in (face or '').lower(), os.path.dirname(font_path), ascent + descent
+
+
+def build_ass_script(words: List[dict], video_size: Tuple[int, int], style: dict, offset: float = 0.0,
+                     candidates: Optional[Tuple[str, ...]] = None) -> Tuple[str, Optional[str]]:
+    """
+    Build the ASS document for the alignment `words` ({'word', 'start', 'end'}).
+
+    Returns (script_text, fontsdir). Captions are centered on the frame and the
+    bounce scales from 1 + BOUNCE_SCALE down to 1 over BOUNCE_DURATION.
+    """
+    vw, vh = video_size
+    family, bold, fontsdir, size = caption_font(style, candidates)
+    outline = style.get('strokeWidth', 4)
+    primary = ass_color(style.get('fill', '#FFFFFF'))
+    stroke = ass_color(style.get('stroke', '#000000'))
+    start_scale = int(round((1.0 + BOUNCE_SCALE) * 100))
+    bounce_ms = int(round(BOUNCE_DURATION * 1000))
+
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {vw}",
+        f"PlayResY: {vh}",
+        "WrapStyle: 2",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+        "Alignment, MarginL, MarginR, MarginV, Encoding",
+        f"Style: Caption,{family},{size},{primary},{primary},{stroke},&H00000000,"
+        f"{-1 if bold else 0},0,0,0,100,100,0,0,1,{outline},0,5,0,0,0,1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+    for w in words:
+        text = escape_ass_text(str(w['word']).strip())
+        start = offset + float(w['start'])
+        end = offset + float(w['end'])
+        if not text or end <= start:
+            continue
+        override = (
+            f"{{\\pos({vw // 2},{vh // 2})\\fscx{start_scale}\\fscy{start_scale}"
+            f"\\t(0,{bounce_ms},\\fscx100\\fscy100)}}"
+        )
+        lines.append(f"Dialogue: 0,{ass_timestamp(start)},{ass_timestamp(end)},Caption,,0,0,0,,{override}{text}")
+    return "\n".join(lines) + "\n", fontsdir
+
+
+def write_ass_script(words: List[dict], path: str, video_size: Tuple[int, int], style: dict, offset: float = 0.0,
+                     candidates: Optional[Tuple[str, ...]] = None) -> Optional[str]:
+    """Write the ASS script to `path` and return the fontsdir libass should use."""
+    script, fontsdir = build_ass_script(words, video_size, style, offset, candidates)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(script)
+    logger.info(f"Wrote ASS captions for {len(words)} words to {path}")
+    return fontsdir
+
+
+def ass_filter(path: str, fontsdir: Optional[str] = None) -> str:
+    """FFmpeg `ass` filter expression that burns in the script at `path`."""
+    expr = f"ass=filename={escape_filter_path(path)}"
+    if fontsdir:
+        expr += f":fontsdir={escape_filter_path(fontsdir)}"
+    return expr
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of pre-normalized backgrounds.
+
+Every render used to decode the full-resolution gameplay source and scale +
+crop it to 1080x1920 frame by frame. The background library is small and
+fixed, so each source is transcoded once to a 1080x1920 @ 30 fps mezzanine
+(video only) keyed by the content hash plus target geometry, and renders open
+the cached file directly. Entries are evicted least-recently-used once the
+cache grows past its disk cap.
+"""
+
+import logging
+import os
+import threading
+from typing import Optional, Tuple
+
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+from ffmpeg_tools import atomic_output, cache_root, file_digest, mark_used, record_cache_entry, run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+TARGET_SIZE = (1080, 1920)
+TARGET_FPS = 30
+DEFAULT_MAX_BYTES = 8 * 1024 ** 3
+# Bumped whenever the mezzanine encoding changes (2: no B-frames, so keyframe cuts are exact)
+FORMAT_VERSION = 2
+
+
+class BackgroundCache:
+    """Mezzanine files in `root`, capped at `max_bytes` (BACKGROUND_CACHE_MAX_BYTES env)."""
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.root = root or cache_root('backgrounds')
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('BACKGROUND_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, source: str, size: Tuple[int, int] = TARGET_SIZE, fps: int = TARGET_FPS) -> str:
+        return f"{file_digest(source)[:32]}-{size[0]}x{size[1]}-{fps}-v{FORMAT_VERSION}"
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.mp4")
+
+    def get(self, source: str, size: Tuple[int, int] = TARGET_SIZE, fps: int = TARGET_FPS) -> str:
+        """Path of the normalized copy of `source`, transcoding it on a miss."""
+        key = self.key(source, size, fps)
+        path = self.path_for(key)
+        if os.path.exists(path):
+            self.hits += 1
+            mark_used(path)
+            return path
+        self.misses += 1
+        logger.info(f"Normalizing background {source} -> {path}")
+        self.transcode(source, path, size, fps)
+        # Content-addressed: later file_digest() calls on the mezzanine never read it
+        record_cache_entry(path, key)
+        self.evict(keep=path)
+        return path
+
+    def transcode(self, source: str, path: str, size: Tuple[int, int], fps: int):
+        w, h = size
+        partial = atomic_output(path)
+        try:
+            run_ffmpeg([
+                '-i', source,
+                '-an',
+                # Frame-rate conversion, then crop, then scale: only the kept frames and pixels are scaled
+                '-vf', f"fps={fps},crop='min(iw,ih*{w}/{h})':'min(ih,iw*{h}/{w})',scale={w}:{h},setsar=1",
+                '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '18',
+                '-pix_fmt', 'yuv420p',
+                # Fixed GOP without B-frames: stream-copy joins can cut on any keyframe
+                '-g', str(fps * 2), '-bf', '0',
+                '-movflags', '+faststart',
+                partial,
+            ])
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+
+    def loop_unit(self, source: str, crossfade: float) -> str:
+        """
+        Path of a copy of `source` that loops seamlessly: its last `crossfade`
+        seconds are cross-faded into its first ones, so playing it back to back
+        has no visible seam. The result is `crossfade` seconds shorter than the source.
+        """
+        key = f"{file_digest(source)[:32]}-loop{int(round(crossfade * 1000))}ms"
+        path = self.path_for(key)
+        if os.path.exists(path):
+            self.hits += 1
+            mark_used(path)
+            return path
+        self.misses += 1
+        infos = ffmpeg_parse_infos(source)
+        duration = float(infos['duration'])
+        fps = infos.get('video_fps') or TARGET_FPS
+        if duration <= 2 * crossfade:
+            raise ValueError(f"Background {source} ({duration:.2f}s) is too short for a {crossfade:.2f}s crossfade")
+        logger.info(f"Building {crossfade:.2f}s crossfade loop for {source} -> {path}")
+        partial = atomic_output(path)
+        try:
+            # body = [crossfade, end], head = [0, crossfade]; the tail of the body fades into the head
+            run_ffmpeg([
+                '-i', source,
+                '-an',
+                '-filter_complex',
+                f"[0:v]split[b][h];"
+                f"[b]trim=start={crossfade:.3f},setpts=PTS-STARTPTS,fps={fps}[body];"
+                f"[h]trim=end={crossfade:.3f},setpts=PTS-STARTPTS,fps={fps}[head];"
+                f"[body][head]xfade=transition=fade:duration={crossfade:.3f}:offset={duration - 2 * crossfade:.3f}[v]",
+                '-map', '[v]',
+                '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '18',
+                '-pix_fmt', 'yuv420p',
+                '-movflags', '+faststart',
+                partial,
+            ])
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+        record_cache_entry(path, key)
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep: Optional[str] = None):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.root):
+                if not name.endswith('.mp4') or '.partial' in name:
+                    continue
+                path = os.path.join(self.root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_atime, st.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                    logger.info(f"Evicted cached background {path} ({size / 1e6:.1f} MB)")
+                except FileNotFoundError:
+                    pass
+
+
+_cache: Optional[BackgroundCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_background_cache() -> BackgroundCache:
+    """Process-wide background cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = BackgroundCache()
+        return _cache
+
+
+def normalized_background(source: str, size: Tuple[int, int] = TARGET_SIZE, fps: int = TARGET_FPS) -> str:
+    """Cached 1080x1920 mezzanine for `source`, or `source` itself if normalization fails."""
+    try:
+        return get_background_cache().get(source, size, fps)
+    except Exception as e:
+        logger.warning(f"Background cache unavailable for {source}, using it as is: {e}")
+        return source
+
+
+def seamless_loop(source: str, crossfade: float) -> str:
+    """Crossfaded loop unit of `source`, or `source` itself if it cannot be built."""
+    if crossfade <= 0:
+        return source
+    try:
+        return get_background_cache().loop_unit(source, crossfade)
+    except Exception as e:
+        logger.warning(f"Could not build a crossfade loop for {source}, looping it as is: {e}")
+        return source
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Background library manifest.
+
+`scripts-backup/download-backgrounds.py` drops files into
+public/backgrounds/<category>/N.mp4. The manifest builder scans that tree
+once, probes each file (duration, resolution, fps, codec, keyframe spacing)
+and writes public/backgrounds/manifest.json, so generators can look up a
+background's metadata or pick one by category and minimum duration without
+spawning FFmpeg at render time. Unchanged files (same size and mtime) are
+not probed again on rebuild.
+
+Usage: python background_library.py [library_dir]
+"""
+
+import bisect
+import json
+import logging
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+from ffmpeg_tools import atomic_output, ffmpeg_binary
+from keyframe_index import get_keyframe_index
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.mkv', '.webm')
+
+
+def default_library_dir() -> str:
+    return os.environ.get('BACKGROUND_LIBRARY_DIR') or os.path.normpath(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'public', 'backgrounds'))
+
+
+def probe_codec(path: str) -> Optional[str]:
+    """Video codec name from FFmpeg's stream description."""
+    result = subprocess.run([ffmpeg_binary(), '-hide_banner', '-i', path], capture_output=True, text=True)
+    m = re.search(r'Stream #\S+.*?: Video: (\w+)', result.stderr)
+    return m.group(1) if m else None
+
+
+def probe_entry(root: str, rel_path: str) -> dict:
+    """Probe one library file into a manifest entry."""
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+    path = os.path.join(root, rel_path)
+    st = os.stat(path)
+    infos = ffmpeg_parse_infos(path)
+    keyframes = get_keyframe_index(path).keyframes
+    gaps = sorted(b - a for a, b in zip(keyframes, keyframes[1:]))
+    width, height = infos.get('video_size') or (None, None)
+    return {
+        'path': rel_path.replace(os.sep, '/'),
+        'category': rel_path.split(os.sep)[0] if os.sep in rel_path else '',
+        'size_bytes': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'duration': float(infos.get('duration') or 0.0),
+        'width': width,
+        'height': height,
+        'fps': infos.get('video_fps'),
+        'codec': probe_codec(path),
+        'has_audio': bool(infos.get('audio_found')),
+        'keyframes': len(keyframes),
+        'keyframe_interval': gaps[len(gaps) // 2] if gaps else None,
+    }
+
+
+def build_manifest(root: Optional[str] = None) -> dict:
+    """Scan `root`, probe new or changed files and write the manifest; returns it."""
+    root = root or default_library_dir()
+    manifest_path = os.path.join(root, MANIFEST_NAME)
+    previous = {}
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path, 'r') as f:
+                previous = {e['path']: e for e in json.load(f).get('entries', [])}
+        except Exception as e:
+            logger.warning(f"Rebuilding unreadable manifest {manifest_path}: {e}")
+
+    entries = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in sorted(filenames):
+            if not name.lower().endswith(VIDEO_EXTENSIONS):
+                continue
+            rel_path = os.path.relpath(os.path.join(dirpath, name), root)
+            st = os.stat(os.path.join(root, rel_path))
+            old = previous.get(rel_path.replace(os.sep, '/'))
+            if old and old.get('size_bytes') == st.st_size and old.get('mtime_ns') == st.st_mtime_ns:
+                entries.append(old)
+                continue
+            try:
+                entries.append(probe_entry(root, rel_path))
+                logger.info(f"Probed {rel_path}")
+            except Exception as e:
+                logger.warning(f"Skipping {rel_path}: {e}")
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'generated_at': int(time.time()),
+        'entries': sorted(entries, key=lambda e: e['path']),
+    }
+    partial = atomic_output(manifest_path)
+    with open(partial, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(partial, manifest_path)
+    logger.info(f"Wrote {len(entries)} backgrounds to {manifest_path}")
+    return manifest
+
+
+class BackgroundLibrary:
+    """
+    In-memory view of a manifest: metadata by path and, per category, entries
+    sorted by duration so a minimum-duration query is a dict lookup plus a bisect.
+    """
+
+    def __init__(self, root: str, entries: List[dict]):
+        self.root = root
+        self.by_path: Dict[str, dict] = {}
+        self.by_category: Dict[str, List[dict]] = {}
+        for entry in entries:
+            self.by_path[os.path.normpath(os.path.join(root, entry['path']))] = entry
+            self.by_category.setdefault(entry['category'], []).append(entry)
+        self._durations: Dict[str, List[float]] = {}
+        for category, items in self.by_category.items():
+            items.sort(key=lambda e: e['duration'])
+            self._durations[category] = [e['duration'] for e in items]
+
+    @classmethod
+    def load(cls, root: Optional[str] = None) -> Optional['BackgroundLibrary']:
+        root = root or default_library_dir()
+        manifest_path = os.path.join(root, MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        if manifest.get('version') != MANIFEST_VERSION:
+            return None
+        return cls(root, manifest.get('entries', []))
+
+    def lookup(self, path: str) -> Optional[dict]:
+        """Metadata for a library file, or None if it is unknown or changed since the manifest was built."""
+        entry = self.by_path.get(os.path.normpath(os.path.abspath(path)))
+        if entry is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if st.st_size != entry['size_bytes'] or st.st_mtime_ns != entry['mtime_ns']:
+            return None
+        return entry
+
+    def select(self, category: str, min_duration: float = 0.0, rng: Optional[random.Random] = None) -> Optional[str]:
+        """Absolute path of a random background in `category` at least `min_duration` long."""
+        items = self.by_category.get(category)
+        if not items:
+            return None
+        i = bisect.bisect_left(self._durations[category], min_duration)
+        if i >= len(items):
+            return None
+        entry = (rng or random).choice(items[i:])
+        return os.path.join(self.root, entry['path'])
+
+
+_library = None
+
+
+def get_background_library() -> Optional[BackgroundLibrary]:
+    """Process-wide library loaded from the default manifest (None if there is none)."""
+    global _library
+    if _library is None:
+        try:
+            _library = BackgroundLibrary.load() or False
+        except Exception as e:
+            logger.warning(f"Could not load background manifest: {e}")
+            _library = False
+    return _library or None
+
+
+def lookup_background(path: str) -> Optional[dict]:
+    """Manifest metadata for `path` if it belongs to the library and is unchanged."""
+    library = get_background_library()
+    return library.lookup(path) if library else None
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    build_manifest(sys.argv[1] if len(sys.argv) > 1 else None)
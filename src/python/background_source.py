@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Background sources.
+
+`LoopingVideoClip` plays a background for any duration by reading one pass
+of the file at a time from an FFmpeg pipe, instead of
+`concatenate_videoclips([clip] * n)`. Frames are pulled sequentially, so
+memory and seek cost do not depend on how many times the background wraps
+around; the reader is reopened from the start of the file at each wrap, and
+with an input `-ss` into the pass when a caller asks for an earlier frame.
+FFmpeg's own `-stream_loop` is not used: combined with a seek it wraps to
+the wrong frame, so a clip started partway would not match one read from 0.
+
+`ScaledVideoClip` reads a segment of a file with scaling, center cropping
+and frame-rate conversion done by the FFmpeg decode command and no audio
+stream decoded, so MoviePy receives frames that are already 1080x1920 @ 30
+fps instead of resizing full-resolution frames in NumPy.
+
+`LavfiVideoClip` reads frames generated by an FFmpeg lavfi source, and
+`StaticFrameClip` computes a never-changing frame once and returns it for
+every t.
+"""
+
+import logging
+import subprocess
+from typing import List, Optional, Tuple
+
+import numpy as np
+from moviepy.editor import VideoClip
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+from ffmpeg_tools import ffmpeg_binary
+
+logger = logging.getLogger(__name__)
+
+
+def cover_filters(size: Tuple[int, int], source_size: Tuple[int, int]) -> List[str]:
+    """
+    -vf filters that center-crop a `source_size` frame to the aspect ratio of
+    `size` (w, h) and scale it to exactly `size`; none if the sizes match.
+    Cropping first means only the kept pixels are scaled.
+    """
+    if tuple(size) == tuple(source_size):
+        return []
+    w, h = size
+    return [f"crop='min(iw,ih*{w}/{h})':'min(ih,iw*{h}/{w})'", f"scale={w}:{h}", "setsar=1"]
+
+
+class FFmpegPipeClip(VideoClip):
+    """
+    Frames of `duration` seconds at `fps` and (w, h) `size`, read as rgb24 from
+    an FFmpeg process. Subclasses supply the input arguments for a start frame.
+    """
+
+    def __init__(self, duration: float, size: Tuple[int, int], fps: float = 30, filters: Optional[List[str]] = None):
+        VideoClip.__init__(self)
+        self.fps = fps
+        self.filters = list(filters or [])
+        self.size = tuple(size)
+        self.duration = duration
+        self.end = duration
+        self.proc = None
+        self.start_index = 0
+        self.next_index = 0
+        self.last_index = None
+        self.last_frame = None
+        self.restarts = 0
+        self.make_frame = self.frame_at
+
+    def input_args(self, index: int) -> List[str]:
+        raise NotImplementedError
+
+    def _start(self, index: int):
+        self._stop()
+        w, h = self.size
+        cmd = [ffmpeg_binary(), '-hide_banner', '-loglevel', 'error'] + self.input_args(index) + [
+            '-an', '-sn',
+            # Drop frames first so a 60 fps source is only scaled at the output rate
+            '-vf', ','.join([f"fps={self.fps}"] + self.filters),
+            '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+            '-',
+        ]
+        self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=w * h * 3 * 4)
+        self.start_index = index
+        self.next_index = index
+        self.restarts += 1
+
+    def _stop(self):
+        if self.proc is not None:
+            self.proc.terminate()
+            try:
+                self.proc.stdout.close()
+                self.proc.wait(timeout=5)
+            except Exception:
+                self.proc.kill()
+            self.proc = None
+
+    def _read(self) -> np.ndarray:
+        w, h = self.size
+        nbytes = w * h * 3
+        data = self.proc.stdout.read(nbytes)
+        self.next_index += 1
+        if len(data) != nbytes:
+            if self.last_frame is None:
+                raise IOError(f"FFmpeg reader for {getattr(self, 'source', 'lavfi')} ended at frame {self.next_index - 1}")
+            # Like MoviePy's reader, repeat the last frame when the stream ends a frame or two early
+            return self.last_frame
+        return np.frombuffer(data, dtype=np.uint8).reshape(h, w, 3)
+
+    def frame_at(self, t: float) -> np.ndarray:
+        index = int(t * self.fps + 1e-6)
+        if index == self.last_index:
+            return self.last_frame
+        # Seek (restart the reader) when going back or jumping far ahead, otherwise decode forward
+        if self.proc is None or index < self.next_index or index - self.next_index > 2 * self.fps:
+            self._start(index)
+        while self.next_index < index:
+            self._read()
+        self.last_frame = self._read()
+        self.last_index = index
+        return self.last_frame
+
+    def frame_key(self, t: float):
+        """(reader, frame index) of the frame shown at `t`; see OverlayCompositor."""
+        return (id(self), int(t * self.fps + 1e-6))
+
+    def close(self):
+        self._stop()
+
+    def __del__(self):
+        self._stop()
+
+
+class LoopingVideoClip(FFmpegPipeClip):
+    """
+    `source` looped to `duration` seconds at `fps`, decoded by one FFmpeg
+    process per pass over the file. If `size` (w, h) differs from the source
+    it is scaled to cover and center-cropped by FFmpeg. `filters` is an
+    optional list of extra -vf filters applied after the frame-rate conversion.
+    The file is only probed for `source_size`/`source_duration` when the
+    caller does not pass them (e.g. from the background library manifest).
+    """
+
+    def __init__(self, source: str, duration: float, fps: float = 30, filters: Optional[List[str]] = None,
+                 size: Optional[Tuple[int, int]] = None, source_size: Optional[Tuple[int, int]] = None,
+                 source_duration: Optional[float] = None):
+        if source_size is None or source_duration is None:
+            infos = ffmpeg_parse_infos(source)
+            source_size = source_size or infos['video_size']
+            source_duration = source_duration or infos['duration']
+        source_size = tuple(source_size)
+        filters = cover_filters(size or source_size, source_size) + list(filters or [])
+        FFmpegPipeClip.__init__(self, duration, size or source_size, fps, filters)
+        self.source = source
+        self.source_duration = float(source_duration)
+        # Output frames in one pass over the source; frame i shows frame i % loop_frames of the pass
+        self.loop_frames = max(1, int(round(self.source_duration * fps)))
+
+    def input_args(self, index: int) -> List[str]:
+        offset = (index % self.loop_frames) / self.fps
+        return (['-ss', f"{offset:.6f}"] if offset else []) + ['-i', self.source]
+
+    def _read(self) -> np.ndarray:
+        # Reopen the file at each wrap rather than reading past the end of the pass
+        if self.next_index % self.loop_frames == 0 and self.next_index != self.start_index:
+            self._start(self.next_index)
+        return FFmpegPipeClip._read(self)
+
+
+class ScaledVideoClip(FFmpegPipeClip):
+    """
+    `duration` seconds of `source` from `start`, scaled to cover `size` (w, h),
+    center-cropped and converted to `fps` while decoding (video stream only).
+    `source_size` and `source_duration` are probed unless given.
+    """
+
+    def __init__(self, source: str, size: Tuple[int, int], fps: float = 30, start: float = 0.0,
+                 duration: Optional[float] = None, source_size: Optional[Tuple[int, int]] = None,
+                 source_duration: Optional[float] = None):
+        if source_size is None or (duration is None and source_duration is None):
+            infos = ffmpeg_parse_infos(source)
+            source_size = source_size or infos['video_size']
+            source_duration = source_duration or infos['duration']
+        source_size = tuple(source_size)
+        if duration is None:
+            duration = max(0.0, float(source_duration) - start)
+        FFmpegPipeClip.__init__(self, duration, size, fps, cover_filters(size, source_size))
+        self.source = source
+        self.start_offset = start
+        self.source_size = source_size
+        self.source_duration = source_duration
+
+    def input_args(self, index: int) -> List[str]:
+        return ['-ss', f"{self.start_offset + index / self.fps:.6f}", '-i', self.source]
+
+
+class LavfiVideoClip(FFmpegPipeClip):
+    """Frames generated natively by an FFmpeg lavfi source `graph` (e.g. color + drawgrid)."""
+
+    def __init__(self, graph: str, duration: float, size: Tuple[int, int], fps: float = 30):
+        FFmpegPipeClip.__init__(self, duration, size, fps)
+        self.graph = graph
+
+    def input_args(self, index: int) -> List[str]:
+        # lavfi sources cannot seek on input, so skip ahead on the output side
+        return ['-f', 'lavfi', '-i', self.graph, '-ss', f"{index / self.fps:.6f}"]
+
+
+class StaticFrameClip(VideoClip):
+    """
+    A clip whose frame never changes: `frame` (an array, or a callable returning
+    one) is computed once and the same read-only array is returned for every t,
+    and its frame key never changes, so compositors recognise it as static.
+    """
+
+    def __init__(self, frame, duration: float):
+        VideoClip.__init__(self)
+        frame = np.ascontiguousarray(frame() if callable(frame) else frame, dtype=np.uint8)
+        frame.flags.writeable = False
+        self.frame = frame
+        self.size = (frame.shape[1], frame.shape[0])
+        self.duration = duration
+        self.end = duration
+        self.make_frame = lambda t: self.frame
+
+    def frame_key(self, t: float):
+        return (id(self), 0)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Multi-clip background tracks without re-encoding.
+
+`FFmpegProcessor.buildBackgroundTrack` (packages/shared/ffmpeg.ts) switches
+between gameplay clips every `switchEverySec` seconds but re-encodes every
+clip and the join. Here the sources are the background cache's normalized
+mezzanines, which share codec parameters and have a keyframe every two
+seconds, so each segment is cut on keyframes and the segments are joined by
+the FFmpeg concat demuxer (`inpoint`/`outpoint` directives) with stream copy:
+building a track only rewrites packets.
+
+Tracks live next to the mezzanines and share their disk cap and LRU eviction.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+from typing import List, Optional, Sequence, Tuple
+
+from background_cache import TARGET_FPS, TARGET_SIZE, get_background_cache, normalized_background
+from ffmpeg_tools import atomic_output, file_digest, mark_used, record_cache_entry, run_ffmpeg
+from keyframe_index import KeyframeIndex, get_keyframe_index
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SWITCH_EVERY = 8.0
+
+Segment = Tuple[int, float, float]  # (source index, inpoint, outpoint)
+
+
+def split_sources(backgrounds: str) -> List[str]:
+    """The existing files of an os.pathsep-separated background list; missing entries are skipped."""
+    sources = []
+    for source in backgrounds.split(os.pathsep):
+        if source and os.path.exists(source):
+            sources.append(source)
+        elif source:
+            logger.warning(f"Background {source} does not exist, skipping it")
+    return sources
+
+
+def plan_segments(indexes: Sequence[KeyframeIndex], total_duration: float, switch_every: float,
+                  rng: Optional[random.Random] = None) -> List[Segment]:
+    """
+    Keyframe-aligned segments covering at least `total_duration` seconds,
+    cycling through the sources in a shuffled order and switching roughly
+    every `switch_every` seconds. Each segment starts at a random keyframe and
+    ends on the first keyframe at or after its nominal length, so the track may
+    overrun the total by less than one GOP.
+    """
+    rng = rng or random.Random()
+    if not any(index.duration > 0 for index in indexes):
+        raise ValueError("Background sources have no duration")
+    order = [i for i, index in enumerate(indexes) if index.duration > 0]
+    rng.shuffle(order)
+    segments: List[Segment] = []
+    covered = 0.0
+    k = 0
+    while covered < total_duration:
+        i = order[k % len(order)]
+        k += 1
+        index = indexes[i]
+        want = min(switch_every, total_duration - covered)
+        start = index.pick_segment(want, rng)
+        end = index.keyframe_at_or_after(start + want)
+        if end <= start:
+            end = index.duration
+        segments.append((i, start, end))
+        covered += end - start
+    return segments
+
+
+def write_concat_list(paths: Sequence[str], segments: Sequence[Segment], list_path: str, fps: float):
+    """
+    ffconcat script for `segments`. The inpoint is rounded up to the microsecond so the
+    demuxer's seek lands on the segment's own keyframe, the outpoint sits half a
+    frame before the next keyframe so that keyframe is never copied, and an
+    explicit duration keeps the segment offsets on the frame grid.
+    """
+    with open(list_path, 'w') as f:
+        f.write('ffconcat version 1.0\n')
+        for i, start, end in segments:
+            # The concat demuxer's quoting: single quotes, with embedded ones escaped
+            quoted = os.path.abspath(paths[i]).replace("'", "'\\''")
+            inpoint = math.ceil(start * 1e6) / 1e6
+            f.write(f"file '{quoted}'\ninpoint {inpoint:.6f}\noutpoint {end - 0.5 / fps:.6f}\n"
+                    f"duration {end - start:.6f}\n")
+
+
+def build_background_track(sources: Sequence[str], total_duration: float, switch_every: float = DEFAULT_SWITCH_EVERY,
+                           size: Tuple[int, int] = TARGET_SIZE, fps: int = TARGET_FPS,
+                           seed: Optional[str] = None) -> str:
+    """
+    Path of a background track at least `total_duration` seconds long that
+    switches between `sources` every ~`switch_every` seconds. Sources are
+    normalized to `size`/`fps` first; the join itself is a stream copy.
+    A `seed` (e.g. the job id) makes the segment choice repeatable.
+    """
+    if not sources:
+        raise ValueError("No background sources provided")
+    cache = get_background_cache()
+    paths = [normalized_background(source, size, fps) for source in sources]
+    if any(path == source for path, source in zip(paths, sources)):
+        raise RuntimeError("Every source must be normalized before it can be joined with stream copy")
+    indexes = [get_keyframe_index(path) for path in paths]
+    segments = plan_segments(indexes, total_duration, switch_every,
+                             random.Random(seed) if seed is not None else None)
+
+    plan = json.dumps([[file_digest(paths[i]), round(start, 6), round(end, 6)] for i, start, end in segments])
+    key = f"track-{hashlib.sha256(plan.encode()).hexdigest()[:32]}"
+    path = cache.path_for(key)
+    if os.path.exists(path):
+        cache.hits += 1
+        mark_used(path)
+        return path
+    cache.misses += 1
+
+    logger.info(f"Joining {len(segments)} background segments from {len(paths)} sources "
+                f"(switch every {switch_every:.1f}s) -> {path}")
+    partial = atomic_output(path)
+    list_path = os.path.splitext(partial)[0] + '.ffconcat'
+    try:
+        write_concat_list(paths, segments, list_path, fps)
+        run_ffmpeg([
+            '-f', 'concat', '-safe', '0', '-i', list_path,
+            '-map', '0:v', '-c', 'copy',
+            '-movflags', '+faststart',
+            partial,
+        ])
+        os.replace(partial, path)
+    finally:
+        for leftover in (partial, list_path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    record_cache_entry(path, key)
+    cache.evict(keep=path)
+    return path
+
+
+def switching_background(sources: Sequence[str], total_duration: float, switch_every: float = DEFAULT_SWITCH_EVERY,
+                         size: Tuple[int, int] = TARGET_SIZE, fps: int = TARGET_FPS,
+                         seed: Optional[str] = None) -> str:
+    """Switching background track, or the first source's normalized copy if the track cannot be built."""
+    try:
+        return build_background_track(sources, total_duration, switch_every, size, fps, seed)
+    except Exception as e:
+        logger.warning(f"Could not build a switching background track, using {sources[0]} only: {e}")
+        return normalized_background(sources[0], size, fps)
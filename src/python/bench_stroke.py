@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-word cost of the old offset-loop outline vs the single-pass stroke engine.
+
+Usage: python bench_stroke.py [font_size] [repeats]
+"""
+
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from font_registry import get_font
+from text_stroke import render_stroked_text
+
+WORDS = ["I", "the", "my", "and", "boyfriend", "apartment", "REVENGE", "honestly", "wasn't", "AITA"]
+STROKE_WIDTHS = (2, 4, 6, 8)
+
+
+def legacy_render(word: str, font, fill: str, stroke: str, sw: int) -> np.ndarray:
+    """The (2*sw+1)^2 draw.text loop the caption renderers used before."""
+    bbox = font.getbbox(word)
+    pad = sw * 2 + 10
+    img = Image.new('RGBA', (bbox[2] - bbox[0] + pad * 2, bbox[3] - bbox[1] + pad * 2), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    for dx in range(-sw, sw + 1):
+        for dy in range(-sw, sw + 1):
+            if dx or dy:
+                draw.text((pad + dx, pad + dy), word, font=font, fill=stroke)
+    draw.text((pad, pad), word, font=font, fill=fill)
+    return np.array(img)
+
+
+def per_word_ms(fn, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for word in WORDS:
+            fn(word)
+    return (time.perf_counter() - start) * 1000.0 / (repeats * len(WORDS))
+
+
+def main():
+    font_size = int(sys.argv[1]) if len(sys.argv) > 1 else 75
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    font, font_path = get_font(font_size)
+    print(f"font={font_path} size={font_size} words={len(WORDS)} repeats={repeats}")
+    print(f"{'stroke':>6} {'legacy ms':>10} {'engine ms':>10} {'speedup':>8} {'max alpha diff':>15}")
+    for sw in STROKE_WIDTHS:
+        legacy = per_word_ms(lambda w: legacy_render(w, font, '#FFFFFF', '#000000', sw), repeats)
+        engine = per_word_ms(lambda w: render_stroked_text(w, font, '#FFFFFF', '#000000', sw), repeats)
+        diff = max(
+            int(np.abs(legacy_render(w, font, '#FFFFFF', '#000000', sw)[:, :, 3].astype(np.int16)
+                       - render_stroked_text(w, font, '#FFFFFF', '#000000', sw)[:, :, 3]).max())
+            for w in WORDS
+        )
+        print(f"{sw:>6} {legacy:>10.2f} {engine:>10.2f} {legacy / engine:>7.1f}x {diff:>15}")
+
+
+if __name__ == "__main__":
+    main()
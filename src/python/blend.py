@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Integer premultiplied-alpha compositing for overlays.
+
+MoviePy blends every overlay with float masks (`mask*img + (1-mask)*bg`).
+Here sprites are stored premultiplied as RGBA uint8 and blended with the
+"over" operator in uint16 arithmetic, in place, touching only the sprite's
+bounding rectangle:
+
+    dst = src + dst * (255 - src_alpha) / 255
+"""
+
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+from moviepy.editor import VideoClip
+
+
+def premultiply(rgba: np.ndarray) -> np.ndarray:
+    """Return a premultiplied copy of a straight-alpha RGBA uint8 array."""
+    out = np.empty(rgba.shape, dtype=np.uint8)
+    a = rgba[:, :, 3:4].astype(np.uint16)
+    out[:, :, :3] = (rgba[:, :, :3].astype(np.uint16) * a + 127) // 255
+    out[:, :, 3] = rgba[:, :, 3]
+    return out
+
+
+def unpremultiply(rgba: np.ndarray) -> np.ndarray:
+    """Return the straight-alpha RGB of a premultiplied RGBA uint8 array."""
+    a = rgba[:, :, 3:4].astype(np.uint16)
+    rgb = (rgba[:, :, :3].astype(np.uint16) * 255 + a // 2) // np.maximum(a, 1)
+    return np.minimum(rgb, 255).astype(np.uint8)
+
+
+def clip_rect(pos: Tuple[int, int], size: Tuple[int, int], frame_size: Tuple[int, int]):
+    """Intersect a sprite at `pos` of (w, h) `size` with the frame; returns (x0, y0, x1, y1) or None."""
+    x, y = pos
+    w, h = size
+    fw, fh = frame_size
+    x0, y0, x1, y1 = max(x, 0), max(y, 0), min(x + w, fw), min(y + h, fh)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return x0, y0, x1, y1
+
+
+def blend_over(frame: np.ndarray, rgba: np.ndarray, pos: Tuple[int, int]) -> None:
+    """
+    Blend a premultiplied RGBA uint8 sprite over an RGB `frame` in place, with
+    the sprite's top-left corner at `pos`. Only the intersecting rectangle is read
+    and written; division by 255 is the exact rounded (x + 128 + (x >> 8)) >> 8.
+    A premultiplied RGBA `frame` gets its alpha composited as well.
+    """
+    h, w = rgba.shape[:2]
+    rect = clip_rect(pos, (w, h), (frame.shape[1], frame.shape[0]))
+    if rect is None:
+        return
+    x0, y0, x1, y1 = rect
+    x, y = pos
+    src = rgba[y0 - y:y1 - y, x0 - x:x1 - x]
+    channels = 4 if frame.shape[2] == 4 else 3
+    dst = frame[y0:y1, x0:x1, :channels]
+    acc = dst.astype(np.uint16)
+    acc *= 255 - src[:, :, 3:4].astype(np.uint16)
+    acc += 128
+    acc += acc >> 8
+    acc >>= 8
+    # Premultiplied colour never exceeds its alpha, so this stays within 0..255
+    acc += src[:, :, :channels]
+    dst[...] = acc
+
+
+class SpriteClip(VideoClip):
+    """
+    A static RGBA overlay (e.g. the title banner) at a fixed position, blended
+    with `blend_over` instead of MoviePy's float-mask blit.
+
+    `rgba` is straight alpha; it is resized to `size` (w, h) if given and stored
+    premultiplied.
+    """
+
+    def __init__(self, rgba: np.ndarray, pos: Tuple[int, int], duration: float,
+                 size: Optional[Tuple[int, int]] = None):
+        VideoClip.__init__(self)
+        sprite = premultiply(rgba)
+        if size is not None and tuple(size) != (rgba.shape[1], rgba.shape[0]):
+            shrinking = size[0] < rgba.shape[1]
+            sprite = cv2.resize(sprite, tuple(size), interpolation=cv2.INTER_AREA if shrinking else cv2.INTER_LINEAR)
+        sprite.flags.writeable = False
+        self.sprite = sprite
+        self.sprite_pos = (int(pos[0]), int(pos[1]))
+        self.size = (sprite.shape[1], sprite.shape[0])
+        self.duration = duration
+        self.end = duration
+
+        self.make_frame = lambda t: unpremultiply(self.sprite)
+        self.mask = VideoClip(ismask=True)
+        self.mask.make_frame = lambda t: self.sprite[:, :, 3] / 255.0
+        self.mask.size = self.size
+        self.mask.duration = duration
+        self.mask.end = duration
+        self.pos = lambda t: self.sprite_pos
+
+    def sprite_at(self, t: float):
+        """(premultiplied rgba, (x, y), key) shown at clip time `t`; the sprite never changes."""
+        return self.sprite, self.sprite_pos, 0
+
+    def blit_on(self, picture, t):
+        """Composite the sprite over `picture` (a copy, as MoviePy's blit returns)."""
+        picture = picture.copy()
+        blend_over(picture, self.sprite, self.sprite_pos)
+        return picture
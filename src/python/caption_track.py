@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+A single clip that renders every caption word of a story.
+
+Instead of one ImageClip layer per word (which makes CompositeVideoClip scan
+hundreds of layers on every frame), the track keeps the word start/end times
+in sorted NumPy arrays, finds the active word with `searchsorted` and blits
+only that word's sprite. The per-frame cost is independent of the word count.
+
+The unique sprites are packed into one premultiplied RGBA atlas
+(see caption_atlas.py) and blitted straight from views into it, restricted
+to the sprite's rectangle.
+
+The pop-in bounce only lasts a few frames, so it is prerendered once per
+sprite into a short frame-indexed sequence; once it is over the resting
+sprite is blitted unchanged.
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from moviepy.editor import VideoClip
+
+from blend import blend_over, unpremultiply
+from caption_atlas import CaptionAtlas
+
+BOUNCE_DURATION = 0.2
+BOUNCE_SCALE = 0.08
+DEFAULT_FPS = 30
+
+_EMPTY_RGBA = np.zeros((1, 1, 4), dtype=np.uint8)
+
+
+def bounce_scale_at(t: float, bounce_duration: float = BOUNCE_DURATION, amount: float = BOUNCE_SCALE) -> float:
+    """Scale factor of the caption pop-in, `t` seconds after the word appears."""
+    p = max(0.0, min(1.0, t / bounce_duration))
+    return 1.0 + amount * (1.0 - p)
+
+
+def prerender_bounce(rgba: np.ndarray, fps: float = DEFAULT_FPS, bounce_duration: float = BOUNCE_DURATION,
+                     amount: float = BOUNCE_SCALE) -> List[np.ndarray]:
+    """
+    Scaled copies of a premultiplied RGBA sprite for every output frame of the
+    bounce (frame k is shown at k / fps seconds). Frames at scale 1.0 are not included.
+    """
+    h, w = rgba.shape[:2]
+    frames = []
+    for k in range(int(math.ceil(bounce_duration * fps))):
+        scale = bounce_scale_at(k / fps, bounce_duration, amount)
+        if scale == 1.0:
+            break
+        new_size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        frames.append(cv2.resize(rgba, new_size, interpolation=cv2.INTER_LINEAR))
+    return frames
+
+
+class CaptionTrack(VideoClip):
+    """
+    Caption layer for a whole story.
+
+    `words` is an iterable of (start, end, rgba) with times in seconds on the
+    track's own timeline and straight-alpha RGBA uint8 sprites. Sprites
+    returned by the word-sprite cache are shared, so repeated words are packed
+    into the atlas once. The bounce is sampled on the `fps` frame grid of the
+    output video.
+    """
+
+    def __init__(self, words: Iterable[Tuple[float, float, np.ndarray]], video_size: Tuple[int, int],
+                 duration: Optional[float] = None, bounce_duration: float = BOUNCE_DURATION,
+                 bounce_scale: float = BOUNCE_SCALE, fps: float = DEFAULT_FPS):
+        VideoClip.__init__(self)
+        words = sorted(words, key=lambda w: float(w[0]))
+
+        sprites = []
+        sprite_index = {}
+        sprite_ids = []
+        for _, _, rgba in words:
+            if id(rgba) not in sprite_index:
+                sprite_index[id(rgba)] = len(sprites)
+                sprites.append(rgba)
+            sprite_ids.append(sprite_index[id(rgba)])
+
+        self.atlas = CaptionAtlas(sprites)
+        self.starts = np.array([float(w[0]) for w in words], dtype=np.float64)
+        self.ends = np.array([float(w[1]) for w in words], dtype=np.float64)
+        self.sprite_ids = np.array(sprite_ids, dtype=np.int32)
+        self.video_size = tuple(video_size)
+        self.bounce_duration = bounce_duration
+        self.bounce_scale = bounce_scale
+        self.bounce_fps = fps
+        self._bounce_frames: Dict[int, List[np.ndarray]] = {}
+        self._last = (None, None)
+
+        self.size = self.video_size
+        if duration is None:
+            duration = float(self.ends.max()) if len(self.ends) else 0.0
+        self.duration = duration
+        self.end = duration
+
+        # Straight RGB + float mask are only built when something asks for them
+        # (e.g. the composite's mask); blit_on blends the atlas directly
+        self.make_frame = lambda t: unpremultiply(self.frame_at(t)[0])
+        self.mask = VideoClip(ismask=True)
+        self.mask.make_frame = lambda t: self.frame_at(t)[0][:, :, 3] / 255.0
+        self.mask.size = self.video_size
+        self.mask.duration = duration
+        self.mask.end = duration
+        self.pos = lambda t: self.frame_at(t)[1]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def word_index(self, t: float) -> int:
+        """Index of the word showing at time `t`, or -1 if no word is active."""
+        i = int(np.searchsorted(self.starts, t, side='right')) - 1
+        if i < 0 or t >= self.ends[i]:
+            return -1
+        return i
+
+    def is_playing(self, t):
+        playing = VideoClip.is_playing(self, t)
+        if isinstance(t, np.ndarray) or not playing:
+            return playing
+        return self.word_index(t - self.start) >= 0
+
+    def bounce_frames(self, sprite_id: int) -> List[np.ndarray]:
+        """Prerendered bounce sequence of a sprite, built the first time the sprite is shown."""
+        frames = self._bounce_frames.get(sprite_id)
+        if frames is None:
+            frames = prerender_bounce(self.atlas.view(sprite_id), self.bounce_fps, self.bounce_duration,
+                                      self.bounce_scale)
+            self._bounce_frames[sprite_id] = frames
+        return frames
+
+    def frame_at(self, t: float):
+        """Return (premultiplied rgba, (x, y)) for time `t`; memoized because rgb, mask and position ask in turn."""
+        result, _ = self._frame_and_key(t)
+        return result
+
+    def _frame_and_key(self, t: float):
+        last_t, last = self._last
+        if last_t == t:
+            return last
+        i = self.word_index(t)
+        key = None
+        if i < 0:
+            result = (_EMPTY_RGBA, (0, 0))
+        else:
+            sprite_id = int(self.sprite_ids[i])
+            rgba = self.atlas.view(sprite_id)
+            h, w = rgba.shape[:2]
+            vw, vh = self.video_size
+            # Anchored at the resting sprite's top-left corner, like the per-word clips were
+            pos = ((vw - w) // 2, (vh - h) // 2)
+            frame_index = int((t - self.starts[i]) * self.bounce_fps + 1e-6)
+            bounce = self.bounce_frames(sprite_id)
+            if frame_index < len(bounce):
+                rgba = bounce[frame_index]
+                key = (sprite_id, frame_index)
+            else:
+                key = (sprite_id, -1)
+            result = (rgba, pos)
+        self._last = (t, (result, key))
+        return result, key
+
+    def sprite_at(self, t: float):
+        """
+        (premultiplied rgba, (x, y), key) of the word shown at track time `t`, or
+        None between words. `key` is (sprite id, bounce frame or -1): equal keys mean
+        equal pixels, although the rgba views are new objects on every call.
+        """
+        if self.word_index(t) < 0:
+            return None
+        (rgba, pos), key = self._frame_and_key(t)
+        return rgba, pos, key
+
+    def blit_on(self, picture, t):
+        """Composite the active word over `picture` (a copy, as MoviePy's blit returns)."""
+        rgba, pos = self.frame_at(t - self.start)
+        picture = picture.copy()
+        blend_over(picture, rgba, pos)
+        return picture
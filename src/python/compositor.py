@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Dirty-rectangle compositing of static overlays over a background.
+
+The banner and every caption word (once its bounce is over) stay unchanged
+for many consecutive frames; only the background moves. The compositor
+keeps the active overlays as a cached premultiplied layer (a few tiles,
+overlapping sprites merged into one) that is rebuilt only when an overlay
+sprite or position changes, and blends just those tiles over each frame.
+
+When the background shows the same frame as on the previous call (a static
+background), the output buffer is reused and only the rectangles covered by
+the old and new overlay tiles are restored and re-blended; when nothing
+changed at all the previous frame is returned as is.
+
+Both checks compare keys, not array identity, because the readers and the
+caption atlas hand out a new view object on every call:
+
+- overlays take part in the cache if they provide `sprite_at(t)` returning
+  (premultiplied rgba, (x, y), key) or None (SpriteClip, CaptionTrack), where
+  equal keys mean equal pixels; any other clip is blitted with MoviePy on
+  top, every frame;
+- backgrounds are recognised as unchanged if they provide `frame_key(t)`
+  (the source and frame index, see background_source.py, frame_prefetch.py
+  and frame_store.py) and it is equal to the previous frame's.
+"""
+
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from moviepy.editor import VideoClip
+
+from blend import blend_over, clip_rect
+
+logger = logging.getLogger(__name__)
+
+Tile = Tuple[Tuple[int, int, int, int], np.ndarray]
+
+
+def union_rect(a, b):
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+def rects_intersect(a, b) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def build_layer(sprites: Sequence[Tuple[np.ndarray, Tuple[int, int]]], frame_size: Tuple[int, int]) -> List[Tile]:
+    """
+    Turn (rgba, pos) sprites, bottom to top, into non-overlapping tiles of
+    ((x0, y0, x1, y1), premultiplied rgba). Overlapping sprites are merged
+    into one tile covering their union so each pixel is blended once per frame.
+    """
+    tiles: List[Tile] = []
+    for rgba, pos in sprites:
+        rect = clip_rect(pos, (rgba.shape[1], rgba.shape[0]), frame_size)
+        if rect is None:
+            continue
+        x0, y0, _, _ = rect
+        tile = (rect, rgba[y0 - pos[1]:rect[3] - pos[1], x0 - pos[0]:rect[2] - pos[0]])
+        overlapping = [t for t in tiles if rects_intersect(t[0], rect)]
+        if overlapping:
+            tiles = [t for t in tiles if not rects_intersect(t[0], rect)]
+            merged = rect
+            for t in overlapping:
+                merged = union_rect(merged, t[0])
+            canvas = np.zeros((merged[3] - merged[1], merged[2] - merged[0], 4), dtype=np.uint8)
+            for (tx0, ty0, _, _), pixels in overlapping + [tile]:
+                blend_over(canvas, pixels, (tx0 - merged[0], ty0 - merged[1]))
+            tile = (merged, canvas)
+        tiles.append(tile)
+    return tiles
+
+
+class OverlayCompositor(VideoClip):
+    """
+    Final video clip: `background` with `overlays` (bottom to top) on top.
+
+    Frames are written into one reusable uint8 buffer, so a returned frame is
+    only valid until the next call (which is how write_videofile consumes them).
+    """
+
+    def __init__(self, background: VideoClip, overlays: Sequence[VideoClip], size: Tuple[int, int],
+                 duration: Optional[float] = None):
+        VideoClip.__init__(self)
+        self.background = background
+        self.overlays = list(overlays)
+        self.size = tuple(size)
+        self.duration = background.duration if duration is None else duration
+        self.end = self.duration
+        self._buffer = None
+        self._bg_key = None
+        self._state = None
+        self._tiles: List[Tile] = []
+        self.full_frames = 0
+        self.partial_frames = 0
+        self.reused_frames = 0
+        self.layer_builds = 0
+        self.make_frame = self.composite
+
+    def overlay_state(self, t: float):
+        """
+        Active cacheable (rgba, pos) sprites at time `t`, the state key that
+        identifies them, and the clips that must be blitted as usual.
+        """
+        sprites, state, others = [], [], []
+        for n, clip in enumerate(self.overlays):
+            if not clip.is_playing(t):
+                continue
+            if hasattr(clip, 'sprite_at'):
+                sprite = clip.sprite_at(t - clip.start)
+                if sprite is not None:
+                    rgba, pos, key = sprite
+                    sprites.append((rgba, pos))
+                    state.append((n, key, pos))
+            else:
+                others.append(clip)
+        return sprites, tuple(state), others
+
+    def background_key(self, t: float):
+        """Key of the background frame at `t`, or None if the background cannot tell."""
+        frame_key = getattr(self.background, 'frame_key', None)
+        return frame_key(t) if frame_key is not None else None
+
+    def composite(self, t: float) -> np.ndarray:
+        bg = self.background.get_frame(t)
+        bg_key = self.background_key(t)
+        sprites, state, others = self.overlay_state(t)
+        old_tiles = self._tiles
+        if state != self._state:
+            self._tiles = build_layer(sprites, self.size)
+            self.layer_builds += 1
+
+        static_bg = bg_key is not None and bg_key == self._bg_key and self._buffer is not None and not others
+        if static_bg and state == self._state:
+            self.reused_frames += 1
+            return self._buffer
+
+        if static_bg:
+            # Restore only what the previous overlays covered, then blend the new ones
+            for (x0, y0, x1, y1), _ in old_tiles:
+                self._buffer[y0:y1, x0:x1] = bg[y0:y1, x0:x1, :3]
+            for (x0, y0, x1, y1), _ in self._tiles:
+                self._buffer[y0:y1, x0:x1] = bg[y0:y1, x0:x1, :3]
+            self.partial_frames += 1
+        else:
+            if self._buffer is None or self._buffer.shape[:2] != bg.shape[:2]:
+                self._buffer = np.empty((bg.shape[0], bg.shape[1], 3), dtype=np.uint8)
+            np.copyto(self._buffer, bg[:, :, :3], casting='unsafe')
+            self.full_frames += 1
+
+        for (x0, y0, _, _), pixels in self._tiles:
+            blend_over(self._buffer, pixels, (x0, y0))
+        self._bg_key = bg_key
+        self._state = state
+
+        if others:
+            frame = self._buffer
+            for clip in others:
+                frame = clip.blit_on(frame, t)
+            # Foreign blits return a new array, so the buffer no longer matches any cached state
+            self._bg_key = None
+            return frame
+        return self._buffer
+
+    def log_stats(self):
+        total = self.full_frames + self.partial_frames + self.reused_frames
+        logger.info(f"Compositor: {total} frames, {self.full_frames} full, {self.partial_frames} dirty-rect, "
+                    f"{self.reused_frames} reused, overlay layer built {self.layer_builds} times")
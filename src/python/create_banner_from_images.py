@@ -8,6 +8,8 @@ import os
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
 import logging
 
+from font_registry import get_font
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -195,42 +197,9 @@ def create_banner_with_images(title, subreddit, author, output_path, width=1080)
         # Create drawing context for text overlays
         draw = ImageDraw.Draw(canvas)
         
-        # Load fonts
-        try:
-            font_paths = [
-                "/System/Library/Fonts/Helvetica.ttc",
-                "/System/Library/Fonts/Arial.ttf",
-                "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
-                "/Windows/Fonts/arialbd.ttf"
-            ]
-            
-            title_font = None
-            username_font = None
-            
-            for font_path in font_paths:
-                if os.path.exists(font_path):
-                    try:
-                        if font_path.endswith('.ttc'):
-                            title_font = ImageFont.truetype(font_path, 67, index=1)  # Bold for title - BIGGER
-                            username_font = ImageFont.truetype(font_path, 60, index=1)  # Same font style as title - BIGGER
-                        else:
-                            title_font = ImageFont.truetype(font_path, 67)  # BIGGER
-                            username_font = ImageFont.truetype(font_path, 60)  # Same font style as title - BIGGER
-                        logger.info(f"Using font: {font_path}")
-                        break
-                    except Exception as font_error:
-                        logger.warning(f"Failed to load font {font_path}: {font_error}")
-                        continue
-            
-            if title_font is None:
-                title_font = ImageFont.load_default()
-                username_font = ImageFont.load_default()
-                logger.warning("Using default fonts")
-                
-        except Exception as e:
-            logger.warning(f"Failed to load fonts: {e}")
-            title_font = ImageFont.load_default()
-            username_font = ImageFont.load_default()
+        # Load fonts (resolved once per process, falls back to the bundled Roboto Bold)
+        title_font, _ = get_font(67)  # BIGGER
+        username_font, _ = get_font(60)  # Same font style as title - BIGGER
         
         # Position username using RATIOS to scale with banner images
         # Exact position: x=220, y=105 (converted to ratios for scaling)
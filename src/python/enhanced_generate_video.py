@@ -8,14 +8,27 @@ import sys
 import json
 import logging
 import os
-import tempfile
 import shutil
 from moviepy.editor import *
 import numpy as np
-import cv2
-from PIL import Image, ImageDraw, ImageFont
-from pathlib import Path
-import time
+
+from background_cache import normalized_background, seamless_loop
+from background_library import lookup_background
+from background_source import LoopingVideoClip, ScaledVideoClip
+from background_track import DEFAULT_SWITCH_EVERY, split_sources, switching_background
+from blend import SpriteClip
+from caption_track import BOUNCE_SCALE, CaptionTrack
+from compositor import OverlayCompositor
+from font_registry import get_font
+from frame_pool import get_frame_pool, pooled_background
+from frame_prefetch import DEFAULT_DEPTH, PrefetchClip
+from frame_sink import write_video
+from frame_store import FrameArrayClip
+from keyframe_index import pick_background_offset, probe_duration
+from render_profiles import DEFAULT_PROFILE, get_profile
+from segment_cache import narration_track
+from sprite_cache import get_sprite_cache, make_sprite_key
+from text_stroke import render_stroked_text
 
 # Set up logging
 logging.basicConfig(
@@ -24,11 +37,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+DEFAULT_CAPTION_STYLE = {
+    'fontSize': 75,
+    'fontFamily': 'Arial-Bold',
+    'fill': '#FFFFFF',
+    'stroke': '#000000',
+    'strokeWidth': 4,
+    'bouncePx': 8
+}
+
 class EnhancedVideoGenerator:
     def __init__(self, job_id: str):
         self.job_id = job_id
         self.temp_files = []
         self.temp_dirs = []
+        self.sprite_cache = get_sprite_cache()
         
     def cleanup(self):
         """Clean up temporary files and directories"""
@@ -50,126 +73,58 @@ class EnhancedVideoGenerator:
         """Report progress to the parent process"""
         print(f"PROGRESS {percent} {stage}", flush=True)
 
-    def create_kinetic_caption(self, word_data: dict, video_size: tuple, style: dict = None) -> ImageClip:
-        """Create a kinetic caption for a single word with bouncing animation"""
-        if style is None:
-            style = {
-                'fontSize': 75,
-                'fontFamily': 'Arial-Bold',
-                'fill': '#FFFFFF',
-                'stroke': '#000000',
-                'strokeWidth': 4,
-                'bouncePx': 8
-            }
-        
-        word = word_data['word']
-        duration = word_data['end'] - word_data['start']
-        
-        # Create text image with PIL for better quality
+    def rasterize_word(self, word: str, font, style: dict) -> np.ndarray:
+        """Render a single outlined word to a straight-alpha RGBA uint8 array"""
+        # Rasterize the glyphs once; the outline comes from the coverage mask in a single pass
+        return render_stroked_text(
+            word, font,
+            fill=style.get('fill', '#FFFFFF'),
+            stroke=style.get('stroke', '#000000'),
+            stroke_width=style.get('strokeWidth', 4)
+        )
+
+    def word_sprite(self, word: str, style: dict) -> np.ndarray:
+        """Return the RGBA sprite for a word, rendering it only on a cache miss"""
         font_size = style.get('fontSize', 75)
-        font_family = style.get('fontFamily', 'Arial-Bold')
-        
-        # Try to load a good font
-        font = None
-        font_paths = [
-            "/System/Library/Fonts/Helvetica.ttc",
-            "/System/Library/Fonts/Arial.ttf",
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
-            "/Windows/Fonts/arialbd.ttf"
-        ]
-        
-        for font_path in font_paths:
-            if os.path.exists(font_path):
-                try:
-                    if font_path.endswith('.ttc'):
-                        font = ImageFont.truetype(font_path, font_size, index=1)
-                    else:
-                        font = ImageFont.truetype(font_path, font_size)
-                    break
-                except Exception as e:
-                    logger.warning(f"Failed to load font {font_path}: {e}")
-        
-        if font is None:
-            font = ImageFont.load_default()
-            logger.warning("Using default font")
-        
-        # Calculate text size
-        bbox = font.getbbox(word)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        
-        # Create image with padding for stroke
-        padding = style.get('strokeWidth', 4) * 2 + 10
-        img_width = text_width + padding * 2
-        img_height = text_height + padding * 2
-        
-        # Create RGBA image
-        img = Image.new('RGBA', (img_width, img_height), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(img)
-        
-        # Draw stroke (outline)
-        stroke_width = style.get('strokeWidth', 4)
-        stroke_color = style.get('stroke', '#000000')
-        if stroke_width > 0:
-            for adj_x in range(-stroke_width, stroke_width + 1):
-                for adj_y in range(-stroke_width, stroke_width + 1):
-                    if adj_x != 0 or adj_y != 0:
-                        draw.text((padding + adj_x, padding + adj_y), word, 
-                                font=font, fill=stroke_color)
-        
-        # Draw main text
-        fill_color = style.get('fill', '#FFFFFF')
-        draw.text((padding, padding), word, font=font, fill=fill_color)
-        
-        # Convert to numpy arrays: RGB + alpha mask
-        rgba_array = np.array(img)
-        rgb_array = rgba_array[:, :, :3]
-        alpha_mask = rgba_array[:, :, 3].astype(np.float32) / 255.0
-        
-        # Create ImageClip with mask and apply simple bounce scale
-        base_clip = ImageClip(rgb_array).set_duration(duration)
-        base_clip = base_clip.set_mask(ImageClip(alpha_mask, ismask=True).set_duration(duration))
-        
-        bounce_duration = 0.2
-        def scale_at_time(t):
-            p = max(0.0, min(1.0, t / bounce_duration))
-            return 1.0 + 0.08 * (1.0 - p)
-        animated_clip = base_clip.resize(scale_at_time)
         
-        # Position at center of video
-        video_width, video_height = video_size
-        caption_x = (video_width - img_width) // 2
-        caption_y = (video_height - img_height) // 2
+        # Fonts are resolved and loaded once per process by the registry
+        font, font_path_used = get_font(font_size)
         
-        return animated_clip.set_position((caption_x, caption_y))
+        # Reuse the rendered sprite if this word was already drawn with the same font and style
+        sprite_key = make_sprite_key(
+            word, font_path_used, font_size,
+            style.get('fill', '#FFFFFF'), style.get('stroke', '#000000'), style.get('strokeWidth', 4)
+        )
+        return self.sprite_cache.get_or_render(
+            sprite_key, lambda: self.rasterize_word(word, font, style)
+        )
 
-    def create_word_captions(self, alignment_data: list, video_size: tuple, style: dict = None, start_offset: float = 0.0) -> list:
-        """Create caption clips for all words with proper timing"""
-        logger.info(f"Creating captions for {len(alignment_data)} words")
-        
-        caption_clips = []
+    def create_caption_track(self, alignment_data: list, video_size: tuple, style: dict = None, start_offset: float = 0.0,
+                             bounce: bool = True) -> CaptionTrack:
+        """Create a single caption track clip holding every word with proper timing"""
+        if style is None:
+            style = DEFAULT_CAPTION_STYLE
+        logger.info(f"Creating caption track for {len(alignment_data)} words")
         
+        words = []
         for word_data in alignment_data:
             try:
-                # Create caption for this word
-                caption_clip = self.create_kinetic_caption(word_data, video_size, style)
-                
-                # Set timing with offset for title audio duration
-                caption_clip = caption_clip.set_start(start_offset + word_data['start']).set_duration(
-                    word_data['end'] - word_data['start']
-                )
-                
-                caption_clips.append(caption_clip)
-                
+                rgba_array = self.word_sprite(word_data['word'], style)
+                start = start_offset + word_data['start']
+                words.append((start, start + (word_data['end'] - word_data['start']), rgba_array))
             except Exception as e:
                 logger.error(f"Failed to create caption for word '{word_data.get('word', 'unknown')}': {e}")
                 continue
         
-        logger.info(f"Successfully created {len(caption_clips)} caption clips")
-        return caption_clips
+        track = CaptionTrack(words, video_size, bounce_scale=BOUNCE_SCALE if bounce else 0.0)
+        logger.info(f"Caption track holds {len(track)} words using {len(track.atlas)} unique sprites")
+        self.sprite_cache.log_stats()
+        return track
 
     def generate_video(self, title_audio_path: str | None, story_audio_path: str, background_path: str, banner_path: str, 
-                      output_path: str, story_data: dict, alignment_path: str):
+                      output_path: str, story_data: dict, alignment_path: str, loop_crossfade: float = 0.0,
+                      prefetch_frames: int = DEFAULT_DEPTH, switch_every: float = DEFAULT_SWITCH_EVERY,
+                      profile: str = DEFAULT_PROFILE):
         """Generate the final video with all components"""
         try:
             logger.info("Starting enhanced video generation...")
@@ -190,29 +145,89 @@ class EnhancedVideoGenerator:
             total_duration = title_duration + story_audio.duration
             logger.info(f"Audio durations - title: {title_duration:.2f}s, story: {story_audio.duration:.2f}s")
             
-            # Load and prepare background
-            background_clip = VideoFileClip(background_path)
-            
             # Target dimensions
-            target_width, target_height = 1080, 1920
+            render = get_profile(profile, script='enhanced_generate_video')
+            target_width, target_height = render.size
+            logger.info(f"Render profile: {render.name} ({target_width}x{target_height})")
             
-            # Resize background to fill screen
-            background_clip = background_clip.resize(height=target_height)
-            if background_clip.w < target_width:
-                background_clip = background_clip.resize(width=target_width)
+            # Several backgrounds (separated by os.pathsep) are switched between every `switch_every` seconds
+            background_paths = split_sources(background_path)
+            if not background_paths:
+                raise FileNotFoundError(f"Background not found: {background_path}")
+            if len(background_paths) > 1:
+                # Keyframe cuts of the normalized sources joined by stream copy, no re-encode
+                background_source = switching_background(
+                    background_paths,
+                    total_duration,
+                    switch_every,
+                    (target_width, target_height),
+                    seed=self.job_id
+                )
+                library_entry = None
+            else:
+                # Load the background, scaled and cropped once per source by the background cache
+                background_source = normalized_background(background_paths[0], (target_width, target_height))
+                # The library manifest knows the duration, so the background is never opened just to measure it
+                library_entry = lookup_background(background_paths[0])
+            if library_entry is not None:
+                background_duration = library_entry['duration']
+            else:
+                background_duration = probe_duration(background_source)
             
-            # Center crop to exact dimensions
-            background_clip = background_clip.crop(
-                x1=(background_clip.w - target_width) // 2,
-                width=target_width
-            )
+            # Passed to the readers so they do not probe the file again: cached copies are at the render size
+            if background_source not in background_paths:
+                background_size = (target_width, target_height)
+            elif library_entry is not None and library_entry.get('width'):
+                background_size = (library_entry['width'], library_entry['height'])
+            else:
+                background_size = None
             
-            # Loop background to match total duration
-            if background_clip.duration < total_duration:
-                n_loops = int(np.ceil(total_duration / background_clip.duration))
-                background_clip = concatenate_videoclips([background_clip] * n_loops)
+            needs_loop = background_duration < total_duration
+            if needs_loop:
+                background_start = 0.0
+                # Pooled frames wrap around by themselves, so a short background pools its crossfaded loop unit
+                loop_source = seamless_loop(background_source, loop_crossfade)
+                if loop_source != background_source:
+                    # The crossfaded loop unit is one crossfade shorter than its source
+                    background_duration -= loop_crossfade
+                background_source = loop_source
+            else:
+                # Keyframe-aligned random start (repeatable per job) so the reader needs no pre-roll
+                background_start = pick_background_offset(background_source, total_duration, seed=self.job_id)
             
-            background_clip = background_clip.subclip(0, total_duration)
+            # Frames decoded by an earlier job in this worker, when the frame pool is enabled
+            background_clip = pooled_background(
+                background_source,
+                (target_width, target_height),
+                total_duration,
+                30,
+                start=background_start
+            )
+            if background_clip is None and needs_loop:
+                # Loop background to match total duration, streamed from one FFmpeg reader
+                background_clip = LoopingVideoClip(
+                    background_source,
+                    total_duration,
+                    fps=30,
+                    size=(target_width, target_height),
+                    source_size=background_size,
+                    source_duration=background_duration
+                )
+                logger.info(f"Looping background to {total_duration:.2f}s (crossfade={loop_crossfade:.2f}s)")
+            elif background_clip is None:
+                # Scaled, cropped and resampled to 30 fps by the decoder; background audio is never decoded
+                background_clip = ScaledVideoClip(
+                    background_source,
+                    (target_width, target_height),
+                    fps=30,
+                    start=background_start,
+                    duration=total_duration,
+                    source_size=background_size
+                )
+            
+            if prefetch_frames > 0 and not isinstance(background_clip, FrameArrayClip):
+                # Decode ahead on a separate thread so decode overlaps compositing and encoding
+                background_clip = PrefetchClip(background_clip, fps=30, depth=prefetch_frames)
             self.report_progress(30, "Background prepared")
             
             # Load banner
@@ -226,44 +241,45 @@ class EnhancedVideoGenerator:
                     banner_img = banner_img.convert('RGBA')
                     logger.info("Converted banner to RGBA for transparency")
                 banner_rgba = np.array(banner_img)
-                banner_rgb = banner_rgba[:, :, :3]
-                banner_alpha = banner_rgba[:, :, 3].astype(np.float32) / 255.0
-                banner_clip = ImageClip(banner_rgb, duration=max(title_duration, 0.0001))
-                banner_clip = banner_clip.set_mask(ImageClip(banner_alpha, ismask=True).set_duration(max(title_duration, 0.0001)))
                 banner_width = int(target_width * 0.9)
                 banner_height = int(banner_width * banner_img.height / banner_img.width)
                 max_banner_height = int(target_height * 0.3)
                 if banner_height > max_banner_height:
                     banner_height = max_banner_height
                     banner_width = int(banner_height * banner_img.width / banner_img.height)
-                banner_clip = banner_clip.resize((banner_width, banner_height))
                 banner_y = (target_height - banner_height) // 2
-                banner_clip = banner_clip.set_position(('center', banner_y))
+                # Premultiplied sprite blended in place with the integer kernel instead of a float mask
+                banner_clip = SpriteClip(
+                    banner_rgba,
+                    ((target_width - banner_width) // 2, banner_y),
+                    max(title_duration, 0.0001),
+                    size=(banner_width, banner_height)
+                )
                 logger.info(f"Banner configured: {banner_width}x{banner_height} at y={banner_y}, duration={title_duration}")
             
             self.report_progress(50, "Banner prepared")
             
             # Load word alignment and create captions
-            caption_clips = []
+            caption_track = None
             if os.path.exists(alignment_path):
                 logger.info(f"Loading word alignment: {alignment_path}")
                 with open(alignment_path, 'r') as f:
                     alignment_data = json.load(f)
-                caption_style = {
+                caption_style = render.scale_style({
                     'fontSize': 75,
                     'fontFamily': 'Arial-Bold',
                     'fill': '#FFFFFF',
                     'stroke': '#000000',
                     'strokeWidth': 4,
                     'bouncePx': 8
-                }
-                caption_clips = self.create_word_captions(
+                })
+                caption_track = self.create_caption_track(
                     alignment_data,
                     (target_width, target_height),
                     caption_style,
-                    start_offset=title_duration
+                    start_offset=title_duration,
+                    bounce=render.bounce
                 )
-                logger.info(f"Created {len(caption_clips)} caption clips")
             
             self.report_progress(70, "Captions prepared")
             
@@ -272,40 +288,43 @@ class EnhancedVideoGenerator:
             video_clips = [background_clip]
             if banner_clip:
                 video_clips.append(banner_clip)
-            video_clips.extend(caption_clips)
-            final_video = CompositeVideoClip(video_clips, size=(target_width, target_height))
+            if caption_track is not None and len(caption_track):
+                video_clips.append(caption_track)
+            # Overlays are blended from a cached layer, touching only the rectangles they cover
+            compositor = OverlayCompositor(video_clips[0], video_clips[1:], (target_width, target_height))
+            final_video = compositor
             
             # Build final audio: title (if any) + story
             if title_audio is not None:
                 combined_audio = concatenate_audioclips([title_audio, story_audio])
+                narration_sources = [title_audio_path, story_audio_path]
             else:
                 combined_audio = story_audio
+                narration_sources = [story_audio_path]
             final_video = final_video.set_audio(combined_audio)
+            encoder = render.encoder()
+            # The same title + story bytes always make the same AAC: encoded once, muxed by stream copy
+            narration = narration_track(narration_sources, lambda: combined_audio, 44100, encoder['audio_bitrate'])
             
             self.report_progress(80, "Compositing")
             
             logger.info(f"Writing final video to: {output_path}")
-            final_video.write_videofile(
+            # Composited frames are queued to an encoder thread that owns the FFmpeg pipe
+            write_video(
+                final_video,
                 output_path,
                 fps=30,
-                codec='libx264',
-                audio_codec='aac',
-                audio_bitrate='192k',
-                bitrate='6000k',
-                preset='medium',
-                ffmpeg_params=[
-                    '-pix_fmt', 'yuv420p',
-                    '-movflags', '+faststart',
-                    '-profile:v', 'high',
-                    '-level', '4.1'
-                ],
-                temp_audiofile='temp-audio.m4a',
-                remove_temp=True,
                 threads=4,
-                verbose=False,
-                logger=None
+                extra_args=['-profile:v', 'high', '-level', '4.1'],
+                audio_path=narration,
+                **encoder
             )
             
+            compositor.log_stats()
+            if isinstance(background_clip, PrefetchClip):
+                background_clip.log_stats()
+            if get_frame_pool().enabled:
+                get_frame_pool().log_stats()
             self.report_progress(100, "Complete")
             
             # Cleanup
@@ -315,8 +334,8 @@ class EnhancedVideoGenerator:
                 title_audio.close()
             if banner_clip:
                 banner_clip.close()
-            for clip in caption_clips:
-                clip.close()
+            if caption_track is not None:
+                caption_track.close()
             final_video.close()
             
             logger.info("✅ Enhanced video generation completed successfully")
@@ -352,7 +371,11 @@ def main():
             banner_path=banner_path,
             output_path=output_path,
             story_data=story_data,
-            alignment_path=alignment_path
+            alignment_path=alignment_path,
+            loop_crossfade=float(os.environ.get('BACKGROUND_LOOP_CROSSFADE', '0') or 0),
+            prefetch_frames=int(os.environ.get('BACKGROUND_PREFETCH_FRAMES', DEFAULT_DEPTH)),
+            switch_every=float(os.environ.get('BACKGROUND_SWITCH_EVERY', DEFAULT_SWITCH_EVERY)),
+            profile=os.environ.get('RENDER_PROFILE', DEFAULT_PROFILE)
         )
         
         generator.cleanup()
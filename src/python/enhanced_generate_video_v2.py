@@ -7,186 +7,297 @@ import sys
 import json
 import logging
 import os
-import shutil
 from typing import Optional, Tuple, Dict, Any
 from moviepy.editor import *
 import numpy as np
-from PIL import Image, ImageDraw, ImageFont
+
+from ass_captions import ass_filter, write_ass_script
+from background_cache import normalized_background, seamless_loop
+from background_library import lookup_background
+from background_source import LavfiVideoClip, LoopingVideoClip, ScaledVideoClip, StaticFrameClip
+from background_track import DEFAULT_SWITCH_EVERY, split_sources, switching_background
+from blend import SpriteClip
+from caption_track import BOUNCE_SCALE, CaptionTrack
+from compositor import OverlayCompositor
+from font_registry import get_font
+from frame_pool import get_frame_pool, pooled_background
+from frame_prefetch import DEFAULT_DEPTH, PrefetchClip
+from frame_sink import encode_audio, frame_count, write_frames, write_video
+from frame_store import MMAP_SCHEME, FrameArrayClip, MemmapVideoClip, raw_frame_background
+from keyframe_index import pick_background_offset, probe_duration
+from parallel_render import DEFAULT_WORKERS, render_chunked
+from render_profiles import DEFAULT_PROFILE, get_profile
+from segment_cache import narration_track
+from sprite_cache import get_sprite_cache, make_sprite_key
+from text_stroke import render_stroked_text
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('enhanced_v2')
 
 VERSION = 'v2-2025-08-19'
 
+# 'moviepy' composites captions in Python, 'ass' burns them in with FFmpeg/libass
+CAPTION_BACKENDS = ('moviepy', 'ass')
+
+CAPTION_FONTS = (
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/System/Library/Fonts/Helvetica.ttc",
+    "/System/Library/Fonts/Arial.ttf",
+)
+
 class EnhancedV2:
     def __init__(self, job_id: str):
         self.job_id = job_id
+        self.sprite_cache = get_sprite_cache()
 
-    def create_grid_background(self, duration: float, w: int = 1080, h: int = 1920) -> VideoClip:
-        # Black base
-        base = ColorClip(size=(w, h), color=(0, 0, 0)).set_duration(duration)
-        # Draw grid using numpy per frame
+    def create_grid_background(self, duration: float, w: int = 1080, h: int = 1920, source: str = 'static') -> VideoClip:
         cell = 200
         thickness = 2
-        def make_frame(t):
+        if source == 'lavfi':
+            # Black canvas with 20% white grid lines generated by FFmpeg; the offset and
+            # line width reproduce the centred lines drawn below
+            graph = (f"color=c=black:s={w}x{h}:r=30:d={duration:.3f},"
+                     f"drawgrid=x={cell - thickness // 2}:y={cell - thickness // 2}"
+                     f":w={cell}:h={cell}:t={2 * (thickness // 2) + 1}:c=white@0.2")
+            return LavfiVideoClip(graph, duration, (w, h), fps=30)
+        def draw_grid():
             frame = np.zeros((h, w, 3), dtype=np.uint8)
-            # draw white grid lines
+            # 20% white grid lines on black
             for x in range(0, w, cell):
-                frame[:, max(0, x - thickness//2):min(w, x + thickness//2 + 1), :] = 255
+                frame[:, max(0, x - thickness//2):min(w, x + thickness//2 + 1), :] = 51
             for y in range(0, h, cell):
-                frame[max(0, y - thickness//2):min(h, y + thickness//2 + 1), :, :] = 255
-            # fade slight alpha
-            frame = (frame * 0.2).astype(np.uint8)
+                frame[max(0, y - thickness//2):min(h, y + thickness//2 + 1), :, :] = 51
             return frame
-        grid = VideoClip(make_frame=make_frame).set_duration(duration)
-        return CompositeVideoClip([base, grid]).set_duration(duration)
+        # The grid never changes: draw it once and hand out the same frame
+        return StaticFrameClip(draw_grid, duration)
+
+    def rasterize_word(self, word: str, font, style: dict):
+        return render_stroked_text(word, font, fill=style.get('fill', '#FFFFFF'),
+                                   stroke=style.get('stroke', '#000000'), stroke_width=style.get('strokeWidth', 4))
 
-    def create_word_clip(self, word: str, duration: float, video_size: tuple, style: dict):
+    def word_sprite(self, word: str, style: dict):
         font_size = style.get('fontSize', 75)
-        font_paths = [
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
-            "/System/Library/Fonts/Helvetica.ttc",
-            "/System/Library/Fonts/Arial.ttf",
-        ]
-        font = None
-        for p in font_paths:
-            if os.path.exists(p):
-                try:
-                    if p.endswith('.ttc'):
-                        font = ImageFont.truetype(p, font_size, index=1)
-                    else:
-                        font = ImageFont.truetype(p, font_size)
-                    break
-                except Exception:
-                    continue
-        if font is None:
-            font = ImageFont.load_default()
-        bbox = font.getbbox(word)
-        text_w = bbox[2] - bbox[0]
-        text_h = bbox[3] - bbox[1]
-        pad = style.get('strokeWidth', 4) * 2 + 10
-        img_w = text_w + pad * 2
-        img_h = text_h + pad * 2
-        img = Image.new('RGBA', (img_w, img_h), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(img)
-        stroke = style.get('stroke', '#000000')
-        sw = style.get('strokeWidth', 4)
-        for dx in range(-sw, sw + 1):
-            for dy in range(-sw, sw + 1):
-                if dx or dy:
-                    draw.text((pad + dx, pad + dy), word, font=font, fill=stroke)
-        fill = style.get('fill', '#FFFFFF')
-        draw.text((pad, pad), word, font=font, fill=fill)
-        rgba = np.array(img)
-        rgb = rgba[:, :, :3]
-        a = (rgba[:, :, 3].astype(np.float32) / 255.0)
-        base = ImageClip(rgb).set_duration(max(0.0001, duration))
-        base = base.set_mask(ImageClip(a, ismask=True).set_duration(max(0.0001, duration)))
-        # subtle bounce
-        bounce_d = 0.2
-        def scaler(t):
-            p = max(0.0, min(1.0, t / bounce_d))
-            return 1.0 + 0.08 * (1.0 - p)
-        clip = base.resize(scaler)
-        vw, vh = video_size
-        x = (vw - img_w) // 2
-        y = (vh - img_h) // 2
-        return clip.set_position((x, y))
-
-    def generate(self, title_audio: Optional[str], story_audio: str, bg: str, banner_png: str, out_mp4: str, align_json: str):
-        logger.info(f"Starting EnhancedV2 {VERSION}")
-        target_w, target_h = 1080, 1920
-        title_d = 0.0
-        if title_audio and os.path.exists(title_audio):
-            try:
-                logger.info(f"Title audio path: {title_audio} size={os.path.getsize(title_audio)} bytes")
-                tclip = AudioFileClip(title_audio)
-                title_d = float(tclip.duration or 0.0)
-                logger.info(f"Title duration: {title_d:.2f}s")
-            except Exception as e:
-                logger.warning(f"Failed to load title audio: {e}")
-                tclip = None
+        font, font_path = get_font(font_size, CAPTION_FONTS)
+        key = make_sprite_key(word, font_path, font_size, style.get('fill', '#FFFFFF'),
+                              style.get('stroke', '#000000'), style.get('strokeWidth', 4))
+        return self.sprite_cache.get_or_render(key, lambda: self.rasterize_word(word, font, style))
+
+    def create_caption_track(self, data: list, offset: float, video_size: tuple, style: dict,
+                             bounce: bool = True) -> CaptionTrack:
+        words = []
+        for w in data:
+            d = float((w['end'] - w['start']) or 0.0)
+            rgba = self.word_sprite(w['word'], style)
+            start = offset + float(w['start'])
+            words.append((start, start + max(0.0001, d), rgba))
+        track = CaptionTrack(words, video_size, bounce_scale=BOUNCE_SCALE if bounce else 0.0)
+        logger.info(f"Caption track: {len(track)} words, {len(track.atlas)} unique sprites")
+        self.sprite_cache.log_stats()
+        return track
+
+    def prepare_background(self, bg: str, total_d: float, size: Tuple[int, int], loop_crossfade: float = 0.0,
+                           switch_every: float = DEFAULT_SWITCH_EVERY) -> Optional[Dict[str, Any]]:
+        """
+        Resolve `bg` to the cached files the render reads (normalized copy, switching
+        track, loop unit, raw frames) and its start offset, building them if needed.
+        Returns None when the grid background should be synthesized.
+        """
+        # mmap://<path> serves the background from the raw frame store instead of a decoder
+        use_frame_store = bg.startswith(MMAP_SCHEME)
+        if use_frame_store:
+            bg = bg[len(MMAP_SCHEME):]
+        # Several backgrounds (separated by os.pathsep) are switched between every `switch_every` seconds
+        bg_sources = split_sources(bg) if bg != 'PLACEHOLDER' else []
+        if not bg_sources:
+            return None
+        for src in bg_sources:
+            logger.info(f"Background path: {src} size={os.path.getsize(src)}")
+        if len(bg_sources) > 1:
+            # Keyframe cuts of the normalized sources joined by stream copy, no re-encode
+            bg_src = switching_background(bg_sources, total_d, switch_every, size, seed=self.job_id)
+            entry = None
         else:
-            tclip = None
-        logger.info(f"Story audio path: {story_audio} size={os.path.getsize(story_audio)} bytes")
-        sclip = AudioFileClip(story_audio)
-        story_d = float(sclip.duration or 0.0)
-        logger.info(f"Story duration: {story_d:.2f}s")
-        total_d = max(0.1, title_d + story_d)
+            # Scaled + cropped once per source by the background cache
+            bg_src = normalized_background(bg_sources[0], size)
+            # The library manifest knows the duration, so the background is never opened just to measure it
+            entry = lookup_background(bg_sources[0])
+        bg_duration = entry['duration'] if entry is not None else probe_duration(bg_src)
+        logger.info(f"Background duration: {bg_duration:.2f}s")
+        needs_loop = bg_duration < total_d
+        # Keyframe-aligned random start (repeatable per job) so the reader needs no pre-roll
+        start = 0.0 if needs_loop else pick_background_offset(bg_src, total_d, seed=self.job_id)
+        # Predecoded frames wrap around by themselves, so short backgrounds use their crossfaded loop unit
+        frames_src = seamless_loop(bg_src, loop_crossfade) if needs_loop else bg_src
+        frames_path = raw_frame_background(frames_src, size, 30) if use_frame_store else None
+        # Passed to the readers so they do not probe the file again: cached copies are at the
+        # render size, and a crossfaded loop unit is one crossfade shorter than its source
+        if bg_src not in bg_sources:
+            bg_size = size
+        elif entry is not None and entry.get('width'):
+            bg_size = (entry['width'], entry['height'])
+        else:
+            bg_size = None
+        frames_duration = bg_duration - loop_crossfade if frames_src != bg_src else bg_duration
+        return {'source': bg_src, 'frames_source': frames_src, 'frames_path': frames_path,
+                'start': start, 'loop': needs_loop, 'source_size': bg_size, 'frames_duration': frames_duration}
 
-        # Build background
-        if bg == 'PLACEHOLDER' or not os.path.exists(bg):
+    def open_background(self, plan: Optional[Dict[str, Any]], total_d: float, size: Tuple[int, int],
+                        grid_source: str = 'static', prefetch_frames: int = DEFAULT_DEPTH) -> VideoClip:
+        """Background clip for a plan from prepare_background()."""
+        if plan is None:
             logger.info("Synthesizing grid background internally")
-            bgclip = self.create_grid_background(duration=total_d, w=target_w, h=target_h)
+            return self.create_grid_background(duration=total_d, w=size[0], h=size[1], source=grid_source)
+        frames_src, start = plan['frames_source'], plan['start']
+        if plan['frames_path']:
+            # Zero-copy frames from the page cache
+            bgclip = MemmapVideoClip(plan['frames_path'], total_d, start=start)
+            logger.info(f"Background frames mapped from {plan['frames_path']} ({len(bgclip.frames)} frames)")
         else:
-            logger.info(f"Background path: {bg} size={os.path.getsize(bg)}")
-            bgclip = VideoFileClip(bg).resize(height=target_h)
-            logger.info(f"Background duration: {bgclip.duration:.2f}s, size={bgclip.w}x{bgclip.h}")
-            try:
-                f0 = bgclip.get_frame(0)
-                logger.info(f"Background first frame shape: {f0.shape}")
-            except Exception as e:
-                logger.warning(f"Failed to read first background frame: {e}")
-            if bgclip.w < target_w:
-                bgclip = bgclip.resize(width=target_w)
-            bgclip = bgclip.crop(x1=(bgclip.w - target_w)//2, width=target_w)
-            if (bgclip.duration or 0) < total_d:
-                reps = int(np.ceil(total_d / max(0.1, bgclip.duration)))
-                bgclip = concatenate_videoclips([bgclip] * reps)
-            bgclip = bgclip.subclip(0, total_d)
+            # Frames decoded by an earlier job in this worker, when the frame pool is enabled
+            bgclip = pooled_background(frames_src, size, total_d, 30, start=start)
+        if bgclip is None and plan['loop']:
+            # Stream the loop from one FFmpeg reader instead of concatenating copies of the clip
+            bgclip = LoopingVideoClip(frames_src, total_d, fps=30, size=size, source_size=plan['source_size'],
+                                      source_duration=plan['frames_duration'])
+            logger.info(f"Looping background to {total_d:.2f}s")
+        elif bgclip is None:
+            # Scaled, cropped and resampled to 30 fps by the decoder; background audio is never decoded
+            bgclip = ScaledVideoClip(plan['source'], size, fps=30, start=start, duration=total_d,
+                                     source_size=plan['source_size'])
+        if prefetch_frames > 0 and not isinstance(bgclip, FrameArrayClip):
+            # Decode ahead on a separate thread so decode overlaps compositing and encoding
+            bgclip = PrefetchClip(bgclip, fps=30, depth=prefetch_frames)
+        return bgclip
+
+    def build_scene(self, title_d: float, story_d: float, background: Optional[Dict[str, Any]], banner_png: str,
+                    align_json: str, out_mp4: str, caption_backend: str = 'moviepy', grid_source: str = 'static',
+                    prefetch_frames: int = DEFAULT_DEPTH, profile: str = DEFAULT_PROFILE,
+                    window: Optional[Tuple[float, float]] = None) -> 'Scene':
+        """
+        Composited (silent) video of the whole timeline. With a `window` (t0, t1),
+        only the banner and caption words on screen during it are built.
+        """
+        render = get_profile(profile, script='enhanced_generate_video_v2')
+        target_w, target_h = render.size
+        total_d = max(0.1, title_d + story_d)
+        t0, t1 = window if window is not None else (0.0, total_d)
+        bgclip = self.open_background(background, total_d, (target_w, target_h), grid_source, prefetch_frames)
 
         banner_clip = None
-        if os.path.exists(banner_png):
+        if os.path.exists(banner_png) and t0 < max(title_d, 0.0001):
             from PIL import Image as PILImage
             bimg = PILImage.open(banner_png)
             if bimg.mode != 'RGBA':
                 bimg = bimg.convert('RGBA')
             arr = np.array(bimg)
-            brgb = arr[:, :, :3]
-            balpha = arr[:, :, 3].astype(np.float32) / 255.0
-            banner_clip = ImageClip(brgb, duration=max(title_d, 0.0001))
-            banner_clip = banner_clip.set_mask(ImageClip(balpha, ismask=True).set_duration(max(title_d, 0.0001)))
             bw = int(target_w * 0.9)
             bh = int(bw * bimg.height / bimg.width)
             max_h = int(target_h * 0.3)
             if bh > max_h:
                 bh = max_h
                 bw = int(bh * bimg.width / bimg.height)
-            banner_clip = banner_clip.resize((bw, bh)).set_position(('center', (target_h - bh)//2))
-        style = { 'fontSize': 75, 'fill': '#FFFFFF', 'stroke': '#000', 'strokeWidth': 4 }
-        captions = []
+            # Premultiplied sprite blended with the integer kernel instead of a float mask
+            banner_clip = SpriteClip(arr, ((target_w - bw)//2, (target_h - bh)//2), max(title_d, 0.0001), size=(bw, bh))
+        style = render.scale_style({ 'fontSize': 75, 'fill': '#FFFFFF', 'stroke': '#000', 'strokeWidth': 4 })
+        captions = None
+        ass_path = None
+        filters = []
         if os.path.exists(align_json):
             data = json.loads(open(align_json, 'r').read())
-            for w in data:
-                d = float((w['end'] - w['start']) or 0.0)
-                clip = self.create_word_clip(w['word'], d, (target_w, target_h), style)
-                clip = clip.set_start(title_d + float(w['start']))
-                captions.append(clip)
+            if caption_backend == 'ass':
+                # Burn captions in with libass during the encode instead of compositing them in Python
+                ass_path = os.path.splitext(out_mp4)[0] + f'.{os.getpid()}.captions.ass'
+                fontsdir = write_ass_script(data, ass_path, (target_w, target_h), style, offset=title_d, candidates=CAPTION_FONTS)
+                filters.append(ass_filter(ass_path, fontsdir))
+            else:
+                if window is not None:
+                    # Only the words on screen during this chunk
+                    data = [w for w in data
+                            if title_d + float(w['start']) < t1 and title_d + float(w['end'] or w['start']) + 0.0001 > t0]
+                captions = self.create_caption_track(data, title_d, (target_w, target_h), style, bounce=render.bounce)
         layers = [bgclip]
         if banner_clip: layers.append(banner_clip)
-        layers.extend(captions)
-        final = CompositeVideoClip(layers, size=(target_w, target_h)).set_fps(30)
+        if captions is not None and len(captions): layers.append(captions)
+        # Overlays are blended from a cached layer, touching only the rectangles they cover
+        compositor = OverlayCompositor(layers[0], layers[1:], (target_w, target_h))
+        return Scene(compositor, bgclip, [banner_clip, captions], filters, ass_path)
+
+    def generate(self, title_audio: Optional[str], story_audio: str, bg: str, banner_png: str, out_mp4: str, align_json: str,
+                 caption_backend: str = 'moviepy', loop_crossfade: float = 0.0, grid_source: str = 'static',
+                 prefetch_frames: int = DEFAULT_DEPTH, switch_every: float = DEFAULT_SWITCH_EVERY,
+                 profile: str = DEFAULT_PROFILE, workers: int = DEFAULT_WORKERS):
+        logger.info(f"Starting EnhancedV2 {VERSION}")
+        if caption_backend not in CAPTION_BACKENDS:
+            logger.warning(f"Unknown caption backend '{caption_backend}', using moviepy")
+            caption_backend = 'moviepy'
+        render = get_profile(profile, script='enhanced_generate_video_v2')
+        # Every size below (background, banner, captions, encode) follows the profile
+        target_w, target_h = render.size
+        logger.info(f"Render profile: {render.name} ({target_w}x{target_h})")
+        title_d = 0.0
+        if title_audio and os.path.exists(title_audio):
+            try:
+                logger.info(f"Title audio path: {title_audio} size={os.path.getsize(title_audio)} bytes")
+                tclip = AudioFileClip(title_audio)
+                title_d = float(tclip.duration or 0.0)
+                logger.info(f"Title duration: {title_d:.2f}s")
+            except Exception as e:
+                logger.warning(f"Failed to load title audio: {e}")
+                tclip = None
+        else:
+            tclip = None
+        logger.info(f"Story audio path: {story_audio} size={os.path.getsize(story_audio)} bytes")
+        sclip = AudioFileClip(story_audio)
+        story_d = float(sclip.duration or 0.0)
+        logger.info(f"Story duration: {story_d:.2f}s")
+        total_d = max(0.1, title_d + story_d)
         if tclip and title_d > 0.0:
             audio = concatenate_audioclips([tclip, sclip])
+            narration_sources = [title_audio, story_audio]
         else:
             audio = sclip
-        final = final.set_audio(audio.set_fps(44100))
-        logger.info(f"Writing final video to: {out_mp4} total_d={total_d:.2f}s layers={len(layers)}")
-        final.write_videofile(
-            out_mp4,
-            fps=30,
-            codec='mpeg4',
-            audio_codec='aac',
-            bitrate='6000k',
-            audio_bitrate='192k',
-            preset='medium',
-            ffmpeg_params=['-movflags','+faststart'],
-            temp_audiofile='temp-audio.m4a',
-            remove_temp=True,
-            threads=4,
-            verbose=True,
-            logger='bar'
-        )
+            narration_sources = [story_audio]
+        audio = audio.set_fps(44100)
+
+        # Cached background files are built once here, before any chunk worker reads them
+        background = self.prepare_background(bg, total_d, (target_w, target_h), loop_crossfade, switch_every)
+        scene_args = dict(background=background, banner_png=banner_png, align_json=align_json, out_mp4=out_mp4,
+                          caption_backend=caption_backend, grid_source=grid_source,
+                          prefetch_frames=prefetch_frames, profile=render.name)
+        encoder = render.encoder()
+        audio_bitrate = encoder.pop('audio_bitrate')
+        # The same title + story bytes always make the same AAC: encoded once, muxed by stream copy
+        narration = narration_track(narration_sources, lambda: audio, 44100, audio_bitrate)
+        if workers > 1:
+            logger.info(f"Writing final video to: {out_mp4} total_d={total_d:.2f}s in {workers} parallel chunks")
+            audio_path = narration or encode_audio(audio, os.path.splitext(out_mp4)[0] + f".{os.getpid()}.audio.m4a",
+                                                   44100, audio_bitrate)
+            try:
+                render_chunked(render_chunk, (self.job_id, title_d, story_d, scene_args),
+                               frame_count(total_d, 30), out_mp4, audio_path, workers, encoder)
+            finally:
+                if audio_path != narration and os.path.exists(audio_path): os.remove(audio_path)
+        else:
+            scene = self.build_scene(title_d, story_d, **scene_args)
+            final = scene.clip.set_fps(30).set_audio(audio)
+            logger.info(f"Writing final video to: {out_mp4} total_d={total_d:.2f}s layers={scene.layers}")
+            # Composited frames are queued to an encoder thread that owns the FFmpeg pipe
+            try:
+                write_video(
+                    final,
+                    out_mp4,
+                    fps=30,
+                    threads=4,
+                    extra_args=scene.ffmpeg_params(),
+                    audio_bitrate=audio_bitrate,
+                    audio_path=narration,
+                    **encoder
+                )
+                scene.log_stats()
+            finally:
+                scene.close()
+        if get_frame_pool().enabled:
+            get_frame_pool().log_stats()
         # Post-write sanity check
         try:
             out_size = os.path.getsize(out_mp4)
@@ -197,11 +308,63 @@ class EnhancedV2:
             logger.warning(f"Failed to stat output: {e}")
         if tclip: tclip.close()
         sclip.close()
-        if banner_clip: banner_clip.close()
-        for c in captions: c.close()
-        final.close()
         logger.info('EnhancedV2 finished successfully')
 
+
+class Scene:
+    """A built timeline: the composited clip plus what has to be closed and logged after the encode."""
+
+    def __init__(self, compositor: OverlayCompositor, background: VideoClip, overlays: list,
+                 filters: list, ass_path: Optional[str] = None):
+        self.clip = compositor
+        self.background = background
+        self.overlays = [o for o in overlays if o is not None]
+        # FFmpeg video filters applied during the encode (libass captions)
+        self.filters = filters
+        self.ass_path = ass_path
+
+    @property
+    def layers(self) -> int:
+        return 1 + len(self.clip.overlays)
+
+    def ffmpeg_params(self, first_frame: int = 0, fps: float = 30) -> list:
+        """Encoder arguments for the filters, for an encode starting at `first_frame` of the timeline."""
+        if not self.filters:
+            return []
+        chain = ','.join(self.filters)
+        if first_frame:
+            # Chunks are encoded from pts 0; shift to timeline time so libass shows the right words.
+            # setpts drops the frame rate, so it is restated on the output.
+            chain = f"setpts=PTS+{first_frame}/({fps}*TB),{chain},setpts=PTS-STARTPTS"
+            return ['-vf', chain, '-r', f"{fps}"]
+        return ['-vf', chain]
+
+    def log_stats(self):
+        self.clip.log_stats()
+        if isinstance(self.background, PrefetchClip):
+            self.background.log_stats()
+
+    def close(self):
+        for overlay in self.overlays:
+            overlay.close()
+        if self.ass_path and os.path.exists(self.ass_path):
+            os.remove(self.ass_path)
+        self.clip.close()
+
+
+def render_chunk(job_id: str, title_d: float, story_d: float, scene_args: dict,
+                 first: int, last: int, path: str, encoder: dict) -> str:
+    """Chunk worker (runs in a pool process): build the scene around frames [first, last) and encode them."""
+    gen = EnhancedV2(job_id)
+    scene = gen.build_scene(title_d, story_d, window=(first / 30, last / 30), **scene_args)
+    encoder = dict(encoder)
+    extra_args = encoder.pop('extra_args', []) + scene.ffmpeg_params(first, 30)
+    try:
+        write_frames(scene.clip, path, 30, first, last, extra_args=extra_args, **encoder)
+    finally:
+        scene.close()
+    return path
+
 if __name__ == '__main__':
     # Expect 9 args
     if len(sys.argv) != 9:
@@ -216,4 +379,11 @@ if __name__ == '__main__':
     # sys.argv[7] story json unused in v2
     align = sys.argv[8]
     gen = EnhancedV2(job_id)
-    gen.generate(None if title_arg == 'NONE' else title_arg, story, bg, banner, outp, align) 
\ No newline at end of file
+    gen.generate(None if title_arg == 'NONE' else title_arg, story, bg, banner, outp, align,
+                 caption_backend=os.environ.get('CAPTION_BACKEND', 'moviepy'),
+                 loop_crossfade=float(os.environ.get('BACKGROUND_LOOP_CROSSFADE', '0') or 0),
+                 grid_source=os.environ.get('GRID_BACKGROUND', 'static'),
+                 prefetch_frames=int(os.environ.get('BACKGROUND_PREFETCH_FRAMES', DEFAULT_DEPTH)),
+                 switch_every=float(os.environ.get('BACKGROUND_SWITCH_EVERY', DEFAULT_SWITCH_EVERY)),
+                 profile=os.environ.get('RENDER_PROFILE', DEFAULT_PROFILE),
+                 workers=int(os.environ.get('RENDER_WORKERS', DEFAULT_WORKERS))) 
\ No newline at end of file
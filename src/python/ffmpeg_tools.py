@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Small helpers shared by the render caches: locating ffmpeg/ffprobe, running
+them, content hashing and the on-disk cache root.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK = 4 * 1024 * 1024
+
+
+@lru_cache(maxsize=1)
+def ffmpeg_binary() -> str:
+    """The ffmpeg MoviePy uses (FFMPEG_BINARY env or the imageio-ffmpeg build)."""
+    try:
+        from moviepy.config import get_setting
+        return get_setting("FFMPEG_BINARY")
+    except Exception:
+        return os.environ.get('FFMPEG_BINARY') or 'ffmpeg'
+
+
+@lru_cache(maxsize=1)
+def ffprobe_binary() -> Optional[str]:
+    """ffprobe from FFPROBE_BINARY, next to ffmpeg, or on PATH; None if there is none."""
+    candidates = [os.environ.get('FFPROBE_BINARY')]
+    ffmpeg = ffmpeg_binary()
+    if os.path.dirname(ffmpeg):
+        candidates.append(os.path.join(os.path.dirname(ffmpeg), 'ffprobe'))
+    candidates.append(shutil.which('ffprobe'))
+    for candidate in candidates:
+        if candidate and os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            return candidate
+    return None
+
+
+def run_ffmpeg(args: List[str], timeout: Optional[float] = None) -> subprocess.CompletedProcess:
+    """Run ffmpeg with `args`; raise RuntimeError with the end of stderr on failure."""
+    cmd = [ffmpeg_binary(), '-hide_banner', '-loglevel', 'error', '-y'] + list(args)
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed ({result.returncode}): {result.stderr.strip()[-2000:]}")
+    return result
+
+
+def cache_root(name: str) -> str:
+    """Directory for cache `name` under RENDER_CACHE_DIR (default: <tmp>/render-cache)."""
+    base = os.environ.get('RENDER_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'render-cache')
+    path = os.path.join(base, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _record_path(path: str) -> str:
+    return os.path.join(cache_root('digests'), hashlib.sha256(path.encode()).hexdigest()[:32] + '.json')
+
+
+def _persist_digest(path: str, size: int, mtime_ns: int, digest: str):
+    record_path = _record_path(path)
+    try:
+        partial = atomic_output(record_path)
+        with open(partial, 'w') as f:
+            json.dump({'path': path, 'size': size, 'mtime_ns': mtime_ns, 'sha256': digest}, f)
+        os.replace(partial, record_path)
+    except OSError as e:
+        logger.warning(f"Could not persist the digest of {path}: {e}")
+
+
+@lru_cache(maxsize=256)
+def _digest(path: str, size: int, mtime_ns: int) -> str:
+    # Jobs are separate processes, so digests are also kept on disk next to the caches
+    # and a file is only rehashed when its path, size or mtime changes
+    try:
+        with open(_record_path(path), 'r') as f:
+            record = json.load(f)
+        if record.get('path') == path and record.get('size') == size and record.get('mtime_ns') == mtime_ns:
+            return record['sha256']
+    except (OSError, ValueError, KeyError):
+        pass
+    digest = _hash_file(path)
+    _persist_digest(path, size, mtime_ns, digest)
+    return digest
+
+
+def file_digest(path: str) -> str:
+    """
+    SHA-256 of a file's contents, memoized per (path, size, mtime) for the
+    process and persisted under the cache root across processes.
+    """
+    real = os.path.realpath(path)
+    st = os.stat(real)
+    return _digest(real, st.st_size, st.st_mtime_ns)
+
+
+def record_cache_entry(path: str, key: str):
+    """
+    Persist the identity of a content-addressed cache entry that was just
+    written to `path`. Its cache `key` already determines its contents, so
+    file_digest() returns a hash of the key instead of reading the file.
+    """
+    real = os.path.realpath(path)
+    st = os.stat(real)
+    _persist_digest(real, st.st_size, st.st_mtime_ns, hashlib.sha256(f"cache-entry:{key}".encode()).hexdigest())
+
+
+def mark_used(path: str):
+    """
+    Bump a cache entry's LRU timestamp. That is its atime: the mtime is left
+    alone because file_digest() trusts (size, mtime) to skip rehashing.
+    """
+    st = os.stat(path)
+    os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+
+
+def atomic_output(path: str) -> str:
+    """Temp path next to `path` to render into before os.replace(), so readers never see partial files."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{os.getpid()}-{threading.get_ident()}.partial{ext}"
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Process-wide font registry.
+
+Resolves the font family once per process and memoizes FreeType faces per
+(path, size, index), so caption and banner rendering no longer probe the
+filesystem and reload the same face for every word.
+"""
+
+import logging
+import os
+import threading
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from PIL import ImageFont
+
+logger = logging.getLogger(__name__)
+
+# Shipped with the app, used when none of the system fonts are available
+BUNDLED_FONT_PATH = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'assets', 'fonts', 'Roboto-Bold.ttf')
+)
+
+DEFAULT_FONT_CANDIDATES = (
+    "/System/Library/Fonts/Helvetica.ttc",
+    "/System/Library/Fonts/Arial.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/Windows/Fonts/arialbd.ttf",
+)
+
+_default_font_lock = threading.Lock()
+_default_font_warned = False
+
+
+def default_index(font_path: str) -> int:
+    """Face index to use for a font file (the bold face of a .ttc collection)."""
+    return 1 if font_path.endswith('.ttc') else 0
+
+
+@lru_cache(maxsize=256)
+def load_font(font_path: str, size: int, index: int = 0) -> ImageFont.FreeTypeFont:
+    """Load (once) the FreeType face for (path, size, index)."""
+    return ImageFont.truetype(font_path, size, index=index)
+
+
+@lru_cache(maxsize=None)
+def resolve_font_path(candidates: Tuple[str, ...] = DEFAULT_FONT_CANDIDATES) -> Optional[str]:
+    """
+    Return the first usable font among `candidates`, falling back to the bundled
+    Roboto Bold. The result is memoized, so the filesystem is probed once per process.
+    """
+    for font_path in tuple(candidates) + (BUNDLED_FONT_PATH,):
+        if not os.path.exists(font_path):
+            continue
+        try:
+            ImageFont.truetype(font_path, 12, index=default_index(font_path))
+        except Exception as e:
+            logger.warning(f"Failed to load font {font_path}: {e}")
+            continue
+        logger.info(f"Using font: {font_path}")
+        return font_path
+    logger.warning(f"No usable font found (bundled font missing: {BUNDLED_FONT_PATH})")
+    return None
+
+
+def get_font(size: int, candidates: Tuple[str, ...] = DEFAULT_FONT_CANDIDATES):
+    """
+    Return (font, font_path) for the resolved family at `size`.
+
+    font_path is None when even the bundled font is unavailable and Pillow's
+    built-in bitmap font is returned instead.
+    """
+    global _default_font_warned
+    font_path = resolve_font_path(tuple(candidates))
+    if font_path is None:
+        with _default_font_lock:
+            if not _default_font_warned:
+                logger.warning("Using default font")
+                _default_font_warned = True
+        return ImageFont.load_default(), None
+    return load_font(font_path, int(size), default_index(font_path)), font_path
+
+
+def clear_font_cache():
+    """Forget resolved paths and loaded faces (e.g. after installing fonts)."""
+    load_font.cache_clear()
+    resolve_font_path.cache_clear()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+In-memory pool of decoded backgrounds for long-lived render workers.
+
+When the generators are driven in-process by a persistent worker, most jobs
+reuse the same few normalized backgrounds, and each job used to spawn a
+fresh FFmpeg reader to decode frames the previous job had already decoded.
+The pool keeps whole backgrounds decoded (rgb24 at render size and fps) in a
+process-wide, byte-capped LRU, so later jobs slice frames out of RAM.
+
+Decoded frames are large (6.2 MB per 1080x1920 frame), so the pool is off
+unless BACKGROUND_POOL_MAX_BYTES is set, and backgrounds that would not fit
+in it are left to the streaming readers.
+
+The pool only pays off when one process renders many jobs. The generators
+are still started as one-shot scripts (one process per job), and nothing in
+the tree keeps a render process alive yet. Under that invocation every job
+would decode the whole background into RAM and gain nothing, so leave the
+pool off unless the generators are driven in-process by a persistent
+worker.
+"""
+
+import logging
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+from background_source import cover_filters
+from ffmpeg_tools import ffmpeg_binary, file_digest
+from frame_store import FrameArrayClip
+
+logger = logging.getLogger(__name__)
+
+PoolKey = Tuple[str, int, int, int]
+
+
+def decode_frames(source: str, size: Tuple[int, int], fps: int) -> np.ndarray:
+    """All frames of `source` as a read-only (n, h, w, 3) uint8 array at `size` and `fps`."""
+    infos = ffmpeg_parse_infos(source)
+    w, h = size
+    capacity = int(float(infos['duration']) * fps) + 2
+    frames = np.empty((capacity, h, w, 3), dtype=np.uint8)
+    cmd = [ffmpeg_binary(), '-hide_banner', '-loglevel', 'error', '-i', source, '-an', '-sn',
+           '-vf', ','.join([f"fps={fps}"] + cover_filters(size, tuple(infos['video_size']))),
+           '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-']
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    count = 0
+    try:
+        # Read straight into the preallocated frames, no intermediate bytes objects
+        while count < capacity and proc.stdout.readinto(frames[count]) == frames[count].nbytes:
+            count += 1
+    finally:
+        proc.stdout.close()
+        proc.wait()
+    if count == 0:
+        raise IOError(f"No frames decoded from {source}")
+    frames = frames[:count]
+    frames.flags.writeable = False
+    return frames
+
+
+class BackgroundFramePool:
+    """Process-wide LRU of decoded backgrounds, capped at `max_bytes` (BACKGROUND_POOL_MAX_BYTES env)."""
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('BACKGROUND_POOL_MAX_BYTES', 0) or 0)
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[PoolKey, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: Dict[PoolKey, threading.Lock] = {}
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.skipped = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def key(self, source: str, size: Tuple[int, int], fps: int) -> PoolKey:
+        return (file_digest(source), size[0], size[1], fps)
+
+    def get(self, key: PoolKey) -> Optional[np.ndarray]:
+        with self._lock:
+            frames = self._entries.get(key)
+            if frames is None:
+                return None
+            self._entries.move_to_end(key)
+            return frames
+
+    def put(self, key: PoolKey, frames: np.ndarray) -> np.ndarray:
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = frames
+                self.nbytes += frames.nbytes
+            self._entries.move_to_end(key)
+            while self.nbytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+        return self._entries.get(key, frames)
+
+    def frames_for(self, source: str, size: Tuple[int, int], fps: int) -> Optional[np.ndarray]:
+        """Decoded frames of `source`, decoding it into the pool on a miss; None if it cannot fit."""
+        key = self.key(source, size, fps)
+        frames = self.get(key)
+        if frames is not None:
+            self.hits += 1
+            return frames
+        with self._lock:
+            loading = self._loading.setdefault(key, threading.Lock())
+        try:
+            # One decode per background even when concurrent jobs miss on it together
+            with loading:
+                frames = self.get(key)
+                if frames is not None:
+                    self.hits += 1
+                    return frames
+                estimate = int(float(ffmpeg_parse_infos(source)['duration']) * fps + 2) * size[0] * size[1] * 3
+                if estimate > self.max_bytes:
+                    self.skipped += 1
+                    logger.info(f"Background {source} ({estimate / 1e9:.1f} GB decoded) does not fit in the frame pool")
+                    return None
+                self.misses += 1
+                logger.info(f"Decoding background {source} into the frame pool")
+                return self.put(key, decode_frames(source, size, fps))
+        finally:
+            # Dropped on every path (hit, too large, decode error) so the table cannot grow
+            with self._lock:
+                self._loading.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.skipped
+        return {
+            'entries': len(self._entries),
+            'bytes': self.nbytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'skipped': self.skipped,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits / lookups) if lookups else 0.0,
+        }
+
+    def log_stats(self, prefix: str = "Background frame pool"):
+        s = self.stats()
+        logger.info(
+            f"{prefix}: {s['hits']} hits, {s['misses']} misses, {s['skipped']} too large "
+            f"({s['hit_rate'] * 100:.1f}% hit rate), {s['entries']} backgrounds, "
+            f"{s['bytes'] / 1e9:.2f} GB, {s['evictions']} evictions"
+        )
+
+
+_shared_pool: Optional[BackgroundFramePool] = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_frame_pool() -> BackgroundFramePool:
+    """Return the process-wide background frame pool."""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = BackgroundFramePool()
+        return _shared_pool
+
+
+def pooled_background(source: str, size: Tuple[int, int], duration: float, fps: int = 30,
+                      start: float = 0.0) -> Optional[FrameArrayClip]:
+    """Clip over the pooled frames of `source`, or None if the pool is off or cannot hold it."""
+    pool = get_frame_pool()
+    if not pool.enabled:
+        return None
+    try:
+        frames = pool.frames_for(source, size, fps)
+    except Exception as e:
+        logger.warning(f"Frame pool could not decode {source}, streaming it instead: {e}")
+        return None
+    if frames is None:
+        return None
+    return FrameArrayClip(frames, fps, duration, start)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Threaded background decode-ahead.
+
+`write_videofile` asks for frames on one thread, so decoding the background,
+compositing and piping to the encoder never overlap. `PrefetchClip` wraps a
+background clip and decodes it on a dedicated thread into a ring of
+preallocated frames, `depth` frames ahead of the consumer. Decoders (FFmpeg
+pipe reads, NumPy/PIL resize) release the GIL for most of their work, so the
+decode runs alongside compositing on another core.
+
+A returned frame is a slot of the ring and stays valid until the next call,
+the same contract as `OverlayCompositor`. Asking for the same frame twice
+returns the same array. Seeking backwards (or far ahead) restarts the
+producer at the requested frame.
+"""
+
+import logging
+import threading
+from typing import Optional
+
+import numpy as np
+from moviepy.editor import VideoClip
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEPTH = 8
+
+
+class PrefetchClip(VideoClip):
+    """`source` sampled at `fps`, decoded up to `depth` frames ahead on a background thread."""
+
+    def __init__(self, source: VideoClip, fps: float = 30, depth: int = DEFAULT_DEPTH):
+        VideoClip.__init__(self)
+        if depth < 2:
+            raise ValueError(f"Prefetch depth must be at least 2, got {depth}")
+        self.source = source
+        self.fps = fps
+        self.depth = depth
+        self.size = tuple(source.size)
+        self.duration = source.duration
+        self.end = source.duration
+        self.n_frames = max(1, int(round(source.duration * fps)))
+        w, h = self.size
+        self.ring = np.empty((depth, h, w, 3), dtype=np.uint8)
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = False
+        self._error: Optional[BaseException] = None
+        self._held = 0        # frame the consumer holds; its slot must not be overwritten
+        self._produced = 0    # frames [.., _produced) are in the ring
+        self._last_index = None
+        self.producer_stalls = 0  # producer waited for a free slot (consumer is the bottleneck)
+        self.consumer_stalls = 0  # consumer waited for a frame (decode is the bottleneck)
+        self.restarts = 0
+        self.make_frame = self.frame_at
+
+    def _produce(self, start: int):
+        i = start
+        try:
+            while i < self.n_frames:
+                with self._cond:
+                    if i - self._held >= self.depth and not self._stop:
+                        self.producer_stalls += 1
+                        while i - self._held >= self.depth and not self._stop:
+                            self._cond.wait()
+                    if self._stop:
+                        return
+                    # The consumer skipped ahead: do not decode frames nobody will read
+                    i = max(i, self._held)
+                frame = self.source.get_frame(i / self.fps)
+                np.copyto(self.ring[i % self.depth], frame[:, :, :3], casting='unsafe')
+                with self._cond:
+                    self._produced = i + 1
+                    self._cond.notify_all()
+                i += 1
+        except BaseException as e:
+            with self._cond:
+                self._error = e
+                self._cond.notify_all()
+
+    def _start(self, index: int):
+        self._halt()
+        self._stop = False
+        self._error = None
+        self._held = index
+        self._produced = index
+        self._thread = threading.Thread(target=self._produce, args=(index,), name='background-prefetch', daemon=True)
+        self._thread.start()
+        self.restarts += 1
+
+    def _halt(self):
+        if self._thread is not None:
+            with self._cond:
+                self._stop = True
+                self._cond.notify_all()
+            self._thread.join()
+            self._thread = None
+
+    def frame_at(self, t: float) -> np.ndarray:
+        index = min(int(t * self.fps + 1e-6), self.n_frames - 1)
+        if index == self._last_index:
+            return self.ring[index % self.depth]
+        if self._thread is None or index < self._held or index - self._produced > 2 * self.fps:
+            self._start(index)
+        with self._cond:
+            self._held = index
+            self._cond.notify_all()
+            if self._produced <= index and self._error is None:
+                self.consumer_stalls += 1
+                while self._produced <= index and self._error is None:
+                    self._cond.wait()
+            if self._error is not None and self._produced <= index:
+                raise self._error
+        self._last_index = index
+        return self.ring[index % self.depth]
+
+    def frame_key(self, t: float):
+        """The source's key for the frame shown at `t` (ring slots are reused, so never the slot itself)."""
+        index = min(int(t * self.fps + 1e-6), self.n_frames - 1)
+        source_key = getattr(self.source, 'frame_key', None)
+        return source_key(index / self.fps) if source_key is not None else (id(self), index)
+
+    def log_stats(self):
+        logger.info(f"Background prefetch: depth={self.depth}, {self.consumer_stalls} consumer stalls, "
+                    f"{self.producer_stalls} producer stalls, {self.restarts} starts")
+
+    def close(self):
+        self._halt()
+        self.source.close()
+
+    def __del__(self):
+        try:
+            self._halt()
+        except Exception:
+            pass
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Raw-frame encoder pipe.
+
+MoviePy's `write_videofile` composites a frame and then blocks writing it to
+FFmpeg's stdin on the same thread, so the encoder idles while Python
+composites and vice versa. `FrameSink` owns the FFmpeg process and a writer
+thread: the compositor copies each frame into a free buffer from a small
+preallocated pool and queues it, and the writer thread hands the buffer to
+FFmpeg as a memoryview (no further copy) and returns it to the pool.
+Compositing the next frame overlaps the pipe write and the encode.
+
+Encoder settings (codec, preset, CRF or bitrate, pix_fmt, faststart, extra
+output arguments) are supplied by the caller.
+"""
+
+import logging
+import os
+import queue
+import subprocess
+import tempfile
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from ffmpeg_tools import ffmpeg_binary
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 8
+
+
+class FrameSink:
+    """
+    Encode rgb24 frames of `size` (w, h) at `fps` into `path`, optionally
+    muxing an already encoded `audio_path` by stream copy.
+    """
+
+    def __init__(self, path: str, size: Tuple[int, int], fps: float = 30, codec: str = 'libx264',
+                 preset: Optional[str] = 'medium', crf: Optional[int] = None, bitrate: Optional[str] = None,
+                 pix_fmt: str = 'yuv420p', faststart: bool = True, audio_path: Optional[str] = None,
+                 threads: Optional[int] = None, extra_args: Optional[List[str]] = None,
+                 queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.path = path
+        self.size = tuple(size)
+        self.fps = fps
+        self.audio_path = audio_path
+        w, h = self.size
+        cmd = [ffmpeg_binary(), '-hide_banner', '-nostats', '-loglevel', 'error', '-y',
+               '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f"{w}x{h}", '-r', f"{fps}", '-i', '-']
+        if audio_path:
+            cmd += ['-i', audio_path, '-map', '0:v', '-map', '1:a', '-c:a', 'copy']
+        else:
+            cmd += ['-an']
+        cmd += ['-c:v', codec]
+        if preset:
+            cmd += ['-preset', preset]
+        if crf is not None:
+            cmd += ['-crf', str(crf)]
+        if bitrate:
+            cmd += ['-b:v', bitrate]
+        cmd += ['-pix_fmt', pix_fmt]
+        if threads:
+            cmd += ['-threads', str(threads)]
+        if faststart:
+            cmd += ['-movflags', '+faststart']
+        cmd += list(extra_args or []) + [path]
+        self.cmd = cmd
+
+        self._stderr = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self._stderr)
+        self._free: "queue.Queue[np.ndarray]" = queue.Queue()
+        for _ in range(queue_size):
+            self._free.put(np.empty((h, w, 3), dtype=np.uint8))
+        self._queue: "queue.Queue[Optional[np.ndarray]]" = queue.Queue(maxsize=queue_size)
+        self._error: Optional[BaseException] = None
+        self.frames = 0
+        self.producer_stalls = 0  # compositor waited for a free buffer (encoder is the bottleneck)
+        self.consumer_stalls = 0  # writer waited for a frame (compositor is the bottleneck)
+        self._started = time.time()
+        self._writer = threading.Thread(target=self._write_loop, name='frame-sink', daemon=True)
+        self._writer.start()
+
+    def _write_loop(self):
+        stdin = self.proc.stdin
+        while True:
+            try:
+                frame = self._queue.get_nowait()
+            except queue.Empty:
+                self.consumer_stalls += 1
+                frame = self._queue.get()
+            if frame is None:
+                break
+            try:
+                if self._error is None:
+                    stdin.write(memoryview(frame).cast('B'))
+            except BaseException as e:
+                # Keep draining so the compositor never blocks on a dead encoder
+                self._error = e
+            finally:
+                self._free.put(frame)
+
+    def write(self, frame: np.ndarray):
+        """Queue a copy of `frame` (h, w, 3+ uint8); the caller may reuse its array right away."""
+        if self._error is not None:
+            raise RuntimeError(f"Encoder for {self.path} failed: {self.stderr() or self._error}")
+        try:
+            buf = self._free.get_nowait()
+        except queue.Empty:
+            self.producer_stalls += 1
+            buf = self._free.get()
+        np.copyto(buf, frame[:, :, :3], casting='unsafe')
+        self._queue.put(buf)
+        self.frames += 1
+
+    def stderr(self) -> str:
+        self._stderr.seek(0)
+        return self._stderr.read().decode(errors='replace').strip()[-2000:]
+
+    def close(self):
+        """Flush queued frames, finish the encode and raise if FFmpeg failed."""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        try:
+            self.proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self.proc.wait()
+        message = self.stderr()
+        self._stderr.close()
+        if returncode != 0 or self._error is not None:
+            raise RuntimeError(f"Encoder for {self.path} failed ({returncode}): {message or self._error}")
+        elapsed = max(1e-6, time.time() - self._started)
+        logger.info(f"Encoded {self.frames} frames to {self.path} in {elapsed:.1f}s ({self.frames / elapsed:.1f} fps), "
+                    f"{self.producer_stalls} compositor stalls, {self.consumer_stalls} encoder stalls")
+
+    def abort(self):
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        self.proc.kill()
+        self.proc.wait()
+        self._stderr.close()
+
+    def __enter__(self) -> 'FrameSink':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def encode_audio(audio, path: str, fps: int = 44100, bitrate: str = '192k') -> str:
+    """Encode a MoviePy audio clip to AAC at `path` (for muxing by stream copy)."""
+    audio.write_audiofile(path, fps=fps, codec='aac', bitrate=bitrate, verbose=False, logger=None)
+    return path
+
+
+def frame_count(duration: float, fps: float) -> int:
+    """Same frame count as MoviePy's iter_frames: t = 0, 1/fps, ... < duration."""
+    return int(np.ceil(duration * fps - 1e-6))
+
+
+def write_frames(clip, path: str, fps: float = 30, first: int = 0, last: Optional[int] = None,
+                 **encoder) -> None:
+    """Render frames [first, last) of `clip` (all of it by default) to `path` through a FrameSink."""
+    if last is None:
+        last = frame_count(clip.duration, fps)
+    w, h = clip.size
+    with FrameSink(path, (w, h), fps, **encoder) as sink:
+        for i in range(first, last):
+            sink.write(clip.get_frame(i / fps))
+
+
+def write_video(clip, path: str, fps: float = 30, audio_fps: int = 44100, audio_bitrate: str = '192k',
+                audio_path: Optional[str] = None, **encoder) -> None:
+    """
+    Render `clip` to `path` through a FrameSink.
+    `encoder` is passed to FrameSink (codec, preset, crf, bitrate, pix_fmt, ...).
+    An already encoded `audio_path` (e.g. a cached narration track) is muxed by
+    stream copy; otherwise the clip's audio, if any, is encoded to AAC next to
+    the output first.
+    """
+    temp_audio = None
+    if audio_path is None and clip.audio is not None:
+        temp_audio = audio_path = encode_audio(clip.audio, os.path.splitext(path)[0] + f".{os.getpid()}.audio.m4a",
+                                               audio_fps, audio_bitrate)
+    try:
+        write_frames(clip, path, fps, audio_path=audio_path, **encoder)
+    finally:
+        if temp_audio and os.path.exists(temp_audio):
+            os.remove(temp_audio)
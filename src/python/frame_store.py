@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped raw-frame store for the hottest backgrounds.
+
+A background is predecoded once into a file of packed rgb24 frames at the
+render size and frame rate, with a small JSON header next to it. Renders map
+the file with `numpy.memmap` and hand the compositor slices of it: there is
+no decoder process, no copy, and with many jobs a minute on the same few
+backgrounds the OS page cache serves every frame after the first job.
+
+Frames are stored as rgb24 rather than yuv420p so a frame is usable as is;
+a 1080x1920 frame is 6.2 MB (187 MB per second of video), so the store has
+its own disk cap (FRAME_STORE_MAX_BYTES) with least-recently-used eviction,
+and a background whose frames would not fit under the cap is never
+predecoded: it is streamed from its decoder instead.
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+from moviepy.editor import VideoClip
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+from background_source import cover_filters
+from ffmpeg_tools import atomic_output, cache_root, file_digest, mark_used, run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+MMAP_SCHEME = 'mmap://'
+DEFAULT_MAX_BYTES = 16 * 1024 ** 3
+STORE_VERSION = 1
+
+
+def read_header(frames_path: str) -> dict:
+    with open(os.path.splitext(frames_path)[0] + '.json', 'r') as f:
+        return json.load(f)
+
+
+class FrameStore:
+    """Raw frame files in `root`, capped at `max_bytes` (FRAME_STORE_MAX_BYTES env)."""
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.root = root or cache_root('frames')
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('FRAME_STORE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+    def path_for(self, source: str, size: Tuple[int, int], fps: int) -> str:
+        return os.path.join(self.root, f"{file_digest(source)[:32]}-{size[0]}x{size[1]}-{fps}.rgb")
+
+    def get(self, source: str, size: Tuple[int, int], fps: int) -> Optional[str]:
+        """Path of the raw frame file for `source`, predecoding it on a miss; None if it cannot fit."""
+        path = self.path_for(source, size, fps)
+        header_path = os.path.splitext(path)[0] + '.json'
+        if os.path.exists(path) and os.path.exists(header_path):
+            self.hits += 1
+            mark_used(path)
+            return path
+        # Sized before decoding: an hour of 1080x1920 is hundreds of GB of raw frames
+        estimate = (int(float(ffmpeg_parse_infos(source)['duration']) * fps) + 2) * size[0] * size[1] * 3
+        if estimate > self.max_bytes:
+            self.skipped += 1
+            logger.info(f"Background {source} ({estimate / 1e9:.1f} GB of raw frames) does not fit in the frame store")
+            return None
+        self.misses += 1
+        logger.info(f"Predecoding background {source} -> {path}")
+        self.predecode(source, path, size, fps)
+        self.evict(keep=path)
+        return path
+
+    def predecode(self, source: str, path: str, size: Tuple[int, int], fps: int):
+        w, h = size
+        source_size = tuple(ffmpeg_parse_infos(source)['video_size'])
+        partial = atomic_output(path)
+        try:
+            run_ffmpeg([
+                '-i', source,
+                '-an', '-sn',
+                '-vf', ','.join([f"fps={fps}"] + cover_filters(size, source_size)),
+                '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+                partial,
+            ])
+            frames = os.path.getsize(partial) // (w * h * 3)
+            if frames == 0:
+                raise RuntimeError(f"No frames decoded from {source}")
+            header = {'version': STORE_VERSION, 'source': os.path.basename(source),
+                      'width': w, 'height': h, 'fps': fps, 'frames': frames, 'pix_fmt': 'rgb24'}
+            header_partial = atomic_output(os.path.splitext(path)[0] + '.json')
+            with open(header_partial, 'w') as f:
+                json.dump(header, f)
+            # Header first: a frame file is only ever visible with its header in place
+            os.replace(header_partial, os.path.splitext(path)[0] + '.json')
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+
+    def evict(self, keep: Optional[str] = None):
+        """Remove least recently used frame files (and headers) until the store fits in max_bytes."""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.root):
+                if not name.endswith('.rgb') or '.partial' in name:
+                    continue
+                path = os.path.join(self.root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_atime, st.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    # Jobs that still have the file mapped keep reading it after the unlink
+                    os.remove(path)
+                    os.remove(os.path.splitext(path)[0] + '.json')
+                    total -= size
+                    logger.info(f"Evicted raw background frames {path} ({size / 1e9:.1f} GB)")
+                except FileNotFoundError:
+                    pass
+
+
+_store: Optional[FrameStore] = None
+_store_lock = threading.Lock()
+
+
+def get_frame_store() -> FrameStore:
+    """Process-wide raw frame store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FrameStore()
+        return _store
+
+
+def raw_frame_background(source: str, size: Tuple[int, int], fps: int = 30) -> Optional[str]:
+    """Raw frame file for `source`, or None if it is too large for the store or cannot be predecoded."""
+    try:
+        return get_frame_store().get(source, size, fps)
+    except Exception as e:
+        logger.warning(f"Raw frame store unavailable for {source}, decoding it instead: {e}")
+        return None
+
+
+class FrameArrayClip(VideoClip):
+    """
+    `duration` seconds of a (n, h, w, 3) uint8 frame array at `fps`, starting at
+    `start` and looping past its end. Frames are slices of the array, not copies.
+    """
+
+    def __init__(self, frames: np.ndarray, fps: float, duration: float, start: float = 0.0):
+        VideoClip.__init__(self)
+        self.frames = frames
+        self.fps = fps
+        self.first = int(round(start * fps))
+        self.size = (frames.shape[2], frames.shape[1])
+        self.duration = duration
+        self.end = duration
+        self.make_frame = self.frame_at
+
+    def frame_index(self, t: float) -> int:
+        return (self.first + int(t * self.fps + 1e-6)) % len(self.frames)
+
+    def frame_at(self, t: float) -> np.ndarray:
+        return self.frames[self.frame_index(t)]
+
+    def frame_key(self, t: float):
+        """(frame array, frame index) shown at `t`, so a wrapped or one-frame array is recognised as unchanged."""
+        return (id(self.frames), self.frame_index(t))
+
+    def close(self):
+        # The frames are released once no frame handed out still references them
+        self.frames = None
+
+
+class MemmapVideoClip(FrameArrayClip):
+    """A raw frame file mapped with numpy.memmap; frames are read-only slices of the mapping."""
+
+    def __init__(self, frames_path: str, duration: float, start: float = 0.0):
+        header = read_header(frames_path)
+        if header.get('version') != STORE_VERSION or header.get('pix_fmt') != 'rgb24':
+            raise ValueError(f"Unsupported raw frame file {frames_path}")
+        w, h = header['width'], header['height']
+        frames = np.memmap(frames_path, dtype=np.uint8, mode='r', shape=(header['frames'], h, w, 3))
+        FrameArrayClip.__init__(self, frames, header['fps'], duration, start)
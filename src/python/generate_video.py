@@ -15,6 +15,16 @@ import librosa
 import soundfile as sf
 from typing import List, Dict
 
+from background_cache import normalized_background
+from background_library import lookup_background
+from background_source import ScaledVideoClip
+from ffmpeg_tools import file_digest
+from frame_sink import encode_audio, frame_count, write_frames
+from keyframe_index import pick_background_offset, probe_duration
+from parallel_render import CLOSED_GOP, concat_chunks
+from render_profiles import DEFAULT_PROFILE, get_profile
+from segment_cache import get_segment_cache, narration_track
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
@@ -22,6 +32,23 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Bumped whenever the opening's composition changes, to invalidate cached openings
+OPENING_VERSION = 2
+# Narration cache variant of loudness-normalized takes (2: entries from before failed
+# normalizations were excluded may hold raw audio)
+NORMALIZED_NARRATION = 'normalized-2'
+
+def segment_encoder(render):
+    """
+    FrameSink settings of the profile for the opening and story segments. Both are
+    joined by stream copy, so they use exactly these settings (closed GOPs, no
+    faststart until the join).
+    """
+    encoder = render.encoder()
+    encoder.pop('audio_bitrate')
+    encoder.update(faststart=False, threads=4, extra_args=CLOSED_GOP)
+    return encoder
+
 def get_word_timestamps(audio_path):
     """Get word-level timestamps using OpenAI Whisper."""
     try:
@@ -295,7 +322,10 @@ def create_caption(text):
         raise
 
 def normalize_audio(audio_clip):
-    """Normalize audio to ensure consistent volume levels."""
+    """
+    Normalize audio to ensure consistent volume levels. Returns (clip, normalized);
+    `normalized` is False when normalization failed and the clip is returned as is.
+    """
     try:
         audio_array = audio_clip.to_soundarray()
         if len(audio_array.shape) > 1:
@@ -304,11 +334,11 @@ def normalize_audio(audio_clip):
         if rms > 0:
             target_level = 0.707
             gain = target_level / rms
-            return audio_clip.volumex(gain)
-        return audio_clip
+            return audio_clip.volumex(gain), True
+        return audio_clip, True
     except Exception as e:
         logger.warning(f"Failed to normalize audio: {e}")
-        return audio_clip
+        return audio_clip, False
 
 def process_words_into_phrases(words):
     """Process words into single-word phrases for ADHD-style quick cuts."""
@@ -340,7 +370,8 @@ def convert_audio_to_wav(audio_path):
         logger.error(f"Failed to convert audio to WAV: {e}")
         raise
 
-def main(video_id, opening_audio_path, story_audio_path, background_path, banner_path, output_path, story_json):
+def main(video_id, opening_audio_path, story_audio_path, background_path, banner_path, output_path, story_json,
+         profile=DEFAULT_PROFILE):
     temp_dirs = []
     temp_files = []
     try:
@@ -353,19 +384,65 @@ def main(video_id, opening_audio_path, story_audio_path, background_path, banner
         validate_files(opening_audio_path, story_audio_path, background_path, banner_path)
         opening_audio = AudioFileClip(opening_audio_path)
         story_audio = AudioFileClip(story_audio_path)
-        opening_audio = normalize_audio(opening_audio)
-        story_audio = normalize_audio(story_audio)
-        background = VideoFileClip(background_path)
-        target_width = 1080
-        target_height = 1920
-        background = background.resize(height=target_height)
-        background = background.crop(x1=(background.w - target_width) // 2, width=target_width)
-        opening_background = background.subclip(0, opening_audio.duration)
+        opening_audio, opening_normalized = normalize_audio(opening_audio)
+        story_audio, story_normalized = normalize_audio(story_audio)
+        render = get_profile(profile, script='generate_video')
+        # Background, banner, captions and encode all follow the profile
+        target_width, target_height = render.size
+        logger.info(f"Render profile: {render.name} ({target_width}x{target_height})")
+        encoder = segment_encoder(render)
+        opening_duration = opening_audio.duration
+        story_duration = story_audio.duration
+        # Scaled and cropped once per source by the background cache
+        background_source = normalized_background(background_path, (target_width, target_height))
+        opening_frames = frame_count(opening_duration, 30)
+        # Everything the opening segment's pixels depend on. The title audio only sets its length,
+        # so a re-recorded title of the same length reuses the opening
+        opening_inputs = {
+            'version': OPENING_VERSION,
+            'frames': opening_frames,
+            'banner': file_digest(banner_path) if os.path.exists(banner_path) else None,
+            'background': file_digest(background_source),
+            'profile': render.name,
+            'size': [target_width, target_height],
+            'fps': 30,
+            'encoder': encoder,
+        }
+        # Seeded by the opening's own inputs rather than the video id, so retakes of a post
+        # land on the same background clip and reuse its cached opening
+        opening_offset = pick_background_offset(
+            background_source, opening_duration, seed=json.dumps(opening_inputs, sort_keys=True)
+        )
+        opening_inputs['offset'] = opening_offset
+        # The story continues the opening's background when it fits, otherwise it cuts to its own offset
+        # The library manifest knows the duration, so the background is not opened just to measure it
+        library_entry = lookup_background(background_path)
+        if library_entry is not None:
+            background_duration = library_entry['duration']
+        else:
+            background_duration = probe_duration(background_source)
+        if opening_offset + opening_duration + story_duration <= background_duration:
+            story_offset = opening_offset + opening_duration
+        else:
+            story_offset = pick_background_offset(background_source, story_duration, seed=video_id)
+        # Scaled, cropped and resampled to 30 fps by the decoder; background audio is never decoded.
+        # The cached copy is already at the render size, so the readers do not probe it
+        if background_source != background_path:
+            background_size = (target_width, target_height)
+        elif library_entry is not None and library_entry.get('width'):
+            background_size = (library_entry['width'], library_entry['height'])
+        else:
+            background_size = None
+        opening_background = ScaledVideoClip(background_source, (target_width, target_height), fps=30,
+                                             start=opening_offset, duration=opening_duration,
+                                             source_size=background_size)
+        background = ScaledVideoClip(background_source, (target_width, target_height), fps=30,
+                                     start=story_offset, duration=story_duration, source_size=background_size)
         if os.path.exists(banner_path):
             logger.info(f"✅ USING CUSTOM BANNER: {banner_path}")
             from PIL import Image as PILImage
             banner_img = PILImage.open(banner_path)
-            reddit_banner = ImageClip(banner_path, duration=opening_audio.duration)
+            reddit_banner = ImageClip(banner_path, duration=opening_duration)
             banner_width = int(target_width * 0.9)
             banner_height = int(banner_width * banner_img.height / banner_img.width)
             max_banner_height = int(target_height * 0.3)
@@ -376,11 +453,11 @@ def main(video_id, opening_audio_path, story_audio_path, background_path, banner
             reddit_banner = reddit_banner.set_position('center')
         else:
             logger.warning(f"❌ CUSTOM BANNER NOT FOUND: {banner_path}")
-            reddit_banner = ImageClip(np.zeros((100, 100, 3), dtype=np.uint8), duration=opening_audio.duration)
+            reddit_banner = ImageClip(np.zeros((100, 100, 3), dtype=np.uint8), duration=opening_duration)
         opening_segment = CompositeVideoClip(
             [opening_background, reddit_banner],
             size=(target_width, target_height)
-        ).set_audio(opening_audio)
+        )
         story_wav_path, temp_wav_file = convert_audio_to_wav(story_audio_path)
         temp_files.append(temp_wav_file)
         try:
@@ -388,51 +465,50 @@ def main(video_id, opening_audio_path, story_audio_path, background_path, banner
             if not words:
                 raise ValueError("No words detected in the audio")
             segments = process_words_into_phrases(words)
-            story_start = opening_audio.duration
-            story_clips = [background.subclip(story_start, story_start + story_audio.duration)]
+            style = render.scale_style({'fontSize': 80, 'strokeWidth': 5})
+            story_clips = [background]
             for segment in segments:
                 caption = TextClip(
-                    segment["text"].upper(), fontsize=80, color='white', font='Arial-Black',
-                    stroke_color='black', stroke_width=5, method='caption', align='center', size=(1080, None)
+                    segment["text"].upper(), fontsize=style['fontSize'], color='white', font='Arial-Black',
+                    stroke_color='black', stroke_width=style['strokeWidth'], method='caption', align='center',
+                    size=(target_width, None)
                 )
                 caption = caption.set_start(segment["startTime"]).set_end(segment["endTime"]).set_position(('center','center'))
                 story_clips.append(caption)
             story_segment = CompositeVideoClip(
                 story_clips,
                 size=(target_width, target_height)
-            ).set_audio(story_audio)
-            final_video = concatenate_videoclips(
-                [opening_segment, story_segment],
-                method="compose"
-            )
-            final_video.write_videofile(
-                output_path,
-                fps=30,
-                codec='libx264',
-                audio_codec='aac',
-                audio_bitrate='192k',
-                bitrate='8000k',
-                temp_audiofile='temp-audio.m4a',
-                remove_temp=True,
-                threads=4,
-                preset='medium'
             )
         except Exception as e:
             logger.error(f"Failed to process audio: {str(e)}")
-            story_segment = background.subclip(opening_audio.duration, opening_audio.duration + story_audio.duration).set_audio(story_audio)
-            final_video = concatenate_videoclips([opening_segment, story_segment], method="compose")
-            final_video.write_videofile(
-                output_path,
-                fps=30,
-                codec='libx264',
-                audio_codec='aac',
-                audio_bitrate='192k',
-                bitrate='8000k',
-                temp_audiofile='temp-audio.m4a',
-                remove_temp=True,
-                threads=4,
-                preset='medium'
-            )
+            story_segment = background
+        final_video = concatenate_videoclips([opening_segment, story_segment], method="compose")
+        # The opening is the same whenever a post is re-rendered with another story or voice take:
+        # it is encoded once to a closed-GOP file and reused from the segment cache
+        opening_path = get_segment_cache().get(
+            get_segment_cache().key('opening', opening_inputs),
+            lambda path: write_frames(opening_segment, path, 30, **encoder)
+        )
+        # Story frames keep their timeline positions (t = i/30), so the join lands on the same frame grid
+        story_path = os.path.join(temp_dir, f"story.{os.getpid()}.mp4")
+        temp_files.append(story_path)
+        write_frames(final_video, story_path, 30, opening_frames, frame_count(final_video.duration, 30), **encoder)
+        # Narration is encoded once for the whole timeline, so there is no AAC priming gap at the join,
+        # and cached by its input audio, so a re-render with the same takes muxes the same AAC
+        narration = concatenate_audioclips([opening_audio, story_audio])
+        audio_path = None
+        if opening_normalized and story_normalized:
+            audio_path = narration_track([opening_audio_path, story_audio_path], lambda: narration, 44100,
+                                         render.audio_bitrate, variant=NORMALIZED_NARRATION)
+        else:
+            # Never cache a failed normalization under the normalized key
+            logger.warning("Narration was not normalized, encoding it for this render only")
+        if audio_path is None:
+            audio_path = os.path.join(temp_dir, f"narration.{os.getpid()}.m4a")
+            temp_files.append(audio_path)
+            encode_audio(narration, audio_path, 44100, render.audio_bitrate)
+        concat_chunks([opening_path, story_path], output_path, audio_path, faststart=render.encoder()['faststart'])
+        opening_background.close()
         background.close(); opening_audio.close(); story_audio.close()
         for temp_dir in temp_dirs:
             try:
@@ -470,7 +546,8 @@ if __name__ == "__main__":
         banner = sys.argv[5]
         output = sys.argv[6]
         story_data = sys.argv[7]
-        main(video_id, opening_audio, story_audio, background, banner, output, story_data)
+        main(video_id, opening_audio, story_audio, background, banner, output, story_data,
+             profile=os.environ.get('RENDER_PROFILE', DEFAULT_PROFILE))
     except Exception as e:
         logger.error(f"Fatal error: {str(e)}")
         sys.exit(1) 
\ No newline at end of file
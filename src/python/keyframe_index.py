@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Per-background keyframe index and keyframe-aligned segment picker.
+
+MoviePy's reader seeks with an input `-ss`, which decodes from the previous
+keyframe up to the requested time; on long gameplay backgrounds an arbitrary
+start can cost seconds of pre-roll. The keyframe timestamps of each
+background are listed once (ffprobe, reading packets only) and persisted next
+to the render caches, and random start offsets are snapped to keyframes so
+the reader starts decoding exactly where the segment begins.
+"""
+
+import bisect
+import json
+import logging
+import os
+import random
+import re
+import subprocess
+import threading
+from typing import List, Optional
+
+from ffmpeg_tools import atomic_output, cache_root, ffmpeg_binary, ffprobe_binary, file_digest
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+
+
+def probe_keyframes(path: str) -> List[float]:
+    """Keyframe timestamps (seconds) of the first video stream, without decoding."""
+    ffprobe = ffprobe_binary()
+    if ffprobe:
+        result = subprocess.run([
+            ffprobe, '-v', 'error', '-select_streams', 'v:0',
+            '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', path,
+        ], capture_output=True, text=True, check=True)
+        times = []
+        for line in result.stdout.splitlines():
+            pts, _, flags = line.partition(',')
+            if 'K' in flags and pts not in ('', 'N/A'):
+                times.append(float(pts))
+        return sorted(times)
+    # No ffprobe: decode keyframes only and read their timestamps from showinfo
+    result = subprocess.run([
+        ffmpeg_binary(), '-hide_banner', '-skip_frame', 'nokey', '-i', path,
+        '-an', '-vf', 'showinfo', '-f', 'null', '-',
+    ], capture_output=True, text=True, check=True)
+    return sorted(float(m) for m in re.findall(r'pts_time:([0-9.]+)', result.stderr))
+
+
+def probe_duration(path: str) -> float:
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+    return float(ffmpeg_parse_infos(path)['duration'])
+
+
+class KeyframeIndex:
+    """Keyframe timestamps and duration of one background file."""
+
+    def __init__(self, keyframes: List[float], duration: float):
+        self.keyframes = keyframes
+        self.duration = duration
+
+    def __len__(self) -> int:
+        return len(self.keyframes)
+
+    def keyframe_at_or_before(self, t: float) -> float:
+        i = bisect.bisect_right(self.keyframes, t) - 1
+        return self.keyframes[i] if i >= 0 else 0.0
+
+    def keyframe_at_or_after(self, t: float) -> float:
+        """First keyframe at or after `t`, or the end of the file if there is none."""
+        i = bisect.bisect_left(self.keyframes, t - 1e-6)
+        return self.keyframes[i] if i < len(self.keyframes) else self.duration
+
+    def pick_segment(self, length: float, rng: Optional[random.Random] = None) -> float:
+        """
+        Random keyframe-aligned start for a `length`-second segment that fits in
+        the file; 0.0 if the file is not longer than the segment.
+        """
+        latest = self.duration - length
+        if latest <= 0 or not self.keyframes:
+            return 0.0
+        candidates = self.keyframes[:bisect.bisect_right(self.keyframes, latest)]
+        if not candidates:
+            return 0.0
+        return (rng or random).choice(candidates)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_keyframe_index(path: str) -> KeyframeIndex:
+    """Keyframe index of `path`, loaded from the persisted index or probed once and saved."""
+    digest = file_digest(path)
+    with _indexes_lock:
+        index = _indexes.get(digest)
+    if index is not None:
+        return index
+
+    index_path = os.path.join(cache_root('keyframes'), f"{digest[:32]}.json")
+    index = None
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION:
+                index = KeyframeIndex(data['keyframes'], data['duration'])
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable keyframe index {index_path}: {e}")
+    if index is None:
+        index = KeyframeIndex(probe_keyframes(path), probe_duration(path))
+        partial = atomic_output(index_path)
+        with open(partial, 'w') as f:
+            json.dump({'version': INDEX_VERSION, 'source': os.path.basename(path),
+                       'duration': index.duration, 'keyframes': index.keyframes}, f)
+        os.replace(partial, index_path)
+        logger.info(f"Indexed {len(index)} keyframes in {path} ({index.duration:.1f}s)")
+
+    with _indexes_lock:
+        _indexes[digest] = index
+    return index
+
+
+def pick_background_offset(path: str, length: float, seed: Optional[str] = None) -> float:
+    """
+    Keyframe-aligned random start offset for a `length`-second segment of `path`.
+    A `seed` (e.g. the job id) makes the choice repeatable; 0.0 if indexing fails.
+    """
+    try:
+        index = get_keyframe_index(path)
+        offset = index.pick_segment(length, random.Random(seed) if seed is not None else None)
+        logger.info(f"Background offset {offset:.2f}s of {index.duration:.1f}s ({len(index)} keyframes)")
+        return offset
+    except Exception as e:
+        logger.warning(f"Could not pick a background offset for {path}, starting at 0: {e}")
+        return 0.0
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Time-chunked parallel rendering.
+
+A render composites every frame on one Python thread, so a job runs at
+single-core composite speed however many cores the worker has. Here the
+timeline is split into N chunks of whole frames, and each chunk is composited
+and encoded in its own process: the worker builds the scene itself (its
+background reader seeks straight to the chunk's offset and its caption track
+only holds the words on screen during the chunk) and encodes its frames to a
+video-only file.
+
+Every chunk starts on an IDR frame and is encoded with closed GOPs, so no
+frame references across a chunk boundary and the chunks are joined by the
+concat demuxer with stream copy. The narration is encoded once and muxed
+into the joined video, also by stream copy.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from ffmpeg_tools import run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+# One process renders the whole timeline (no chunking)
+DEFAULT_WORKERS = 1
+# x264 output arguments for files that are joined by stream copy
+CLOSED_GOP = ['-flags', '+cgop']
+
+
+def chunk_ranges(n_frames: int, chunks: int) -> List[Tuple[int, int]]:
+    """[first, last) frame ranges splitting `n_frames` frames into `chunks` near-equal chunks."""
+    chunks = max(1, min(chunks, n_frames))
+    bounds = [n_frames * k // chunks for k in range(chunks + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def chunk_encoder(encoder: dict, workers: int) -> dict:
+    """
+    FrameSink settings for one chunk: video only, closed GOPs, no faststart
+    (the join rewrites the file anyway) and an even share of the cores.
+    """
+    chunk = dict(encoder)
+    chunk.pop('audio_bitrate', None)
+    chunk['faststart'] = False
+    chunk['threads'] = max(1, (os.cpu_count() or 1) // workers)
+    chunk['extra_args'] = list(chunk.get('extra_args') or []) + CLOSED_GOP
+    return chunk
+
+
+def concat_chunks(paths: Sequence[str], out_path: str, audio_path: Optional[str] = None,
+                  faststart: bool = True) -> None:
+    """Join chunk files (same encoder settings) into `out_path` by stream copy, muxing `audio_path` if given."""
+    list_path = os.path.splitext(out_path)[0] + f".{os.getpid()}.ffconcat"
+    try:
+        with open(list_path, 'w') as f:
+            f.write('ffconcat version 1.0\n')
+            for path in paths:
+                quoted = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{quoted}'\n")
+        args = ['-f', 'concat', '-safe', '0', '-i', list_path]
+        if audio_path:
+            args += ['-i', audio_path, '-map', '0:v', '-map', '1:a']
+        else:
+            args += ['-map', '0:v']
+        args += ['-c', 'copy']
+        if faststart:
+            args += ['-movflags', '+faststart']
+        run_ffmpeg(args + [out_path])
+    finally:
+        if os.path.exists(list_path):
+            os.remove(list_path)
+
+
+def render_chunked(render_chunk: Callable[..., str], args: tuple, n_frames: int, out_path: str,
+                   audio_path: Optional[str], workers: int, encoder: dict) -> None:
+    """
+    Render `n_frames` frames in `workers` processes and join them into `out_path`.
+    `render_chunk(*args, first, last, path, encoder)` encodes frames [first, last)
+    to `path`; it is pickled to the pool, so it must be a module-level function.
+    """
+    ranges = chunk_ranges(n_frames, workers)
+    chunk_settings = chunk_encoder(encoder, len(ranges))
+    tmpdir = tempfile.mkdtemp(prefix='chunks-', dir=os.path.dirname(os.path.abspath(out_path)))
+    started = time.time()
+    try:
+        paths = [os.path.join(tmpdir, f"chunk-{k:03d}.mp4") for k in range(len(ranges))]
+        with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+            futures = [pool.submit(render_chunk, *args, first, last, path, chunk_settings)
+                       for (first, last), path in zip(ranges, paths)]
+            for future in futures:
+                future.result()
+        logger.info(f"Rendered {n_frames} frames in {len(ranges)} chunks in {time.time() - started:.1f}s")
+        concat_chunks(paths, out_path, audio_path, faststart=encoder.get('faststart', True))
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
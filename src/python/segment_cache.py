@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of rendered segments.
+
+Parts of a render that depend only on a few inputs (e.g. the opening title
+card of a post, which is identical across narration retakes and A/B variants
+of the story, or the narration AAC of a re-rendered post) are encoded once to their own file, keyed by a hash of
+everything that determines their content, and later jobs join the cached file
+to the rest of the render by stream copy instead of compositing and encoding
+it again. Entries are evicted least-recently-used once the cache grows past
+its disk cap.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from ffmpeg_tools import atomic_output, cache_root, file_digest, mark_used
+from frame_sink import encode_audio
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 4 * 1024 ** 3
+
+
+class SegmentCache:
+    """Rendered segment files in `root`, capped at `max_bytes` (SEGMENT_CACHE_MAX_BYTES env)."""
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.root = root or cache_root('segments')
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('SEGMENT_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, kind: str, inputs: Dict[str, Any]) -> str:
+        """Cache key for a `kind` of segment; `inputs` must hold everything its content depends on."""
+        digest = hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+        return f"{kind}-{digest[:32]}"
+
+    def path_for(self, key: str, ext: str = '.mp4') -> str:
+        return os.path.join(self.root, f"{key}{ext}")
+
+    def get(self, key: str, render: Callable[[str], None], ext: str = '.mp4') -> str:
+        """Path of segment `key`, calling `render(path)` to produce it on a miss."""
+        path = self.path_for(key, ext)
+        if os.path.exists(path):
+            self.hits += 1
+            mark_used(path)
+            logger.info(f"Reusing cached segment {path}")
+            return path
+        self.misses += 1
+        logger.info(f"Rendering segment {key} -> {path}")
+        partial = atomic_output(path)
+        try:
+            render(partial)
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep: Optional[str] = None):
+        """Remove least recently used segments until the cache fits in max_bytes."""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.root):
+                if '.partial' in name:
+                    continue
+                path = os.path.join(self.root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_atime, st.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                    logger.info(f"Evicted cached segment {path} ({size / 1e6:.1f} MB)")
+                except FileNotFoundError:
+                    pass
+
+
+_cache: Optional[SegmentCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_segment_cache() -> SegmentCache:
+    """Process-wide segment cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SegmentCache()
+        return _cache
+
+
+def narration_track(sources: Sequence[str], make_audio: Callable[[], Any], fps: int = 44100,
+                    bitrate: str = '192k', variant: str = 'concat') -> Optional[str]:
+    """
+    Cached AAC of the narration made by playing `sources` in order, muxed into
+    renders by stream copy. `make_audio()` builds the MoviePy audio clip on a miss;
+    `variant` names any processing applied to it (e.g. loudness normalization).
+    Returns None if the track cannot be cached, so the caller encodes it itself.
+    """
+    try:
+        cache = get_segment_cache()
+        key = cache.key('narration', {
+            'sources': [file_digest(source) for source in sources],
+            'variant': variant,
+            'codec': 'aac',
+            'fps': fps,
+            'bitrate': bitrate,
+        })
+        return cache.get(key, lambda path: encode_audio(make_audio(), path, fps, bitrate), ext='.m4a')
+    except Exception as e:
+        logger.warning(f"Narration cache unavailable, encoding the audio for this render only: {e}")
+        return None
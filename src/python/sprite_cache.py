@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Bounded LRU cache of rasterized caption word sprites.
+
+A story repeats the same handful of words ("I", "the", "my", ...) hundreds of
+times, so each distinct (word, font, style) combination is rendered once and
+the resulting RGBA array is shared by every caption that uses it.
+"""
+
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 2048
+
+SpriteKey = Tuple[str, str, int, str, str, int]
+Sprite = np.ndarray
+
+
+def normalize_word(word: str) -> str:
+    """Normalize a caption word for use as a cache key (case is preserved, it changes the glyphs)."""
+    return unicodedata.normalize('NFC', word).strip()
+
+
+def make_sprite_key(word: str, font_path: Optional[str], font_size: int, fill: str,
+                    stroke: str, stroke_width: int) -> SpriteKey:
+    """Build the cache key for a word rendered with the given font and style."""
+    return (
+        normalize_word(word),
+        font_path or 'default',
+        int(font_size),
+        str(fill).upper(),
+        str(stroke).upper(),
+        int(stroke_width),
+    )
+
+
+class WordSpriteCache:
+    """LRU cache mapping a sprite key to a prebuilt straight-alpha RGBA uint8 array."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max(1, int(max_entries))
+        self._entries: "OrderedDict[SpriteKey, Sprite]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: SpriteKey) -> Optional[Sprite]:
+        with self._lock:
+            sprite = self._entries.get(key)
+            if sprite is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return sprite
+
+    def put(self, key: SpriteKey, rgba: np.ndarray) -> Sprite:
+        # Sprites are shared between clips, so make sure nobody mutates them in place
+        rgba.setflags(write=False)
+        with self._lock:
+            self._entries[key] = rgba
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return rgba
+
+    def get_or_render(self, key: SpriteKey, render: Callable[[], Sprite]) -> Sprite:
+        """Return the cached sprite for `key`, calling `render()` to build it on a miss."""
+        sprite = self.get(key)
+        if sprite is not None:
+            return sprite
+        return self.put(key, render())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits / lookups) if lookups else 0.0,
+        }
+
+    def log_stats(self, prefix: str = "Word sprite cache"):
+        s = self.stats()
+        logger.info(
+            f"{prefix}: {s['hits']} hits, {s['misses']} misses "
+            f"({s['hit_rate'] * 100:.1f}% hit rate), {s['entries']} entries, {s['evictions']} evictions"
+        )
+
+
+_shared_cache: Optional[WordSpriteCache] = None
+
+
+def get_sprite_cache() -> WordSpriteCache:
+    """Return the process-wide sprite cache."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = WordSpriteCache()
+    return _shared_cache
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The render scripts import their helpers as top-level modules (they are run from src/python)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
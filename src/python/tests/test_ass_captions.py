@@ -0,0 +1,15 @@
+from ass_captions import ass_filter, escape_filter_path
+
+
+def test_filter_path_is_escaped_for_option_and_graph_parsers():
+    # ':' and "'" for the option parser, then every '\\', "'", '[', ']', ',' and ';' for the graph parser
+    assert escape_filter_path("/tmp/a:b") == r"/tmp/a\\:b"
+    assert escape_filter_path("/tmp/it's") == r"/tmp/it\\\'s"
+    assert escape_filter_path("/tmp/a,b;c[d]") == r"/tmp/a\,b\;c\[d\]"
+    assert escape_filter_path("C:\\jobs\\x.ass") == r"C\\:/jobs/x.ass"
+
+
+def test_ass_filter_has_no_unescaped_graph_separators():
+    expr = ass_filter("/tmp/we,ird'dir [x];a:b/c.ass", "/tmp/fonts,dir")
+    unescaped = [c for i, c in enumerate(expr) if c in ",;[]'" and expr[i - 1] != '\\']
+    assert unescaped == []
@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+import ffmpeg_tools
+from background_cache import BackgroundCache
+from ffmpeg_tools import file_digest
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('RENDER_CACHE_DIR', str(tmp_path / 'cache'))
+    root = tmp_path / 'backgrounds'
+    root.mkdir()
+    cache = BackgroundCache(root=str(root), max_bytes=10)
+    transcodes = []
+
+    def transcode(source, path, size, fps):
+        transcodes.append(source)
+        with open(path, 'wb') as f:
+            f.write(b'12345')
+
+    monkeypatch.setattr(cache, 'transcode', transcode)
+    cache.transcodes = transcodes
+    return cache
+
+
+def source(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_key_changes_with_content_and_geometry(cache, tmp_path):
+    bg = source(tmp_path, 'bg.mp4', b'frames')
+    keys = {cache.key(bg), cache.key(bg, (540, 960)), cache.key(bg, fps=60),
+            cache.key(source(tmp_path, 'other.mp4', b'other frames'))}
+    assert len(keys) == 4
+    # Same bytes under another name share the mezzanine
+    assert cache.key(source(tmp_path, 'copy.mp4', b'frames')) == cache.key(bg)
+
+
+def test_get_transcodes_once_and_evicts_least_recently_used(cache, tmp_path):
+    a = source(tmp_path, 'a.mp4', b'a')
+    b = source(tmp_path, 'b.mp4', b'b')
+    c = source(tmp_path, 'c.mp4', b'c')
+    path_a = cache.get(a)
+    assert cache.get(a) == path_a and cache.transcodes == [a]
+    assert (cache.hits, cache.misses) == (1, 1)
+    os.utime(path_a, (1, 1))
+    path_b = cache.get(b)
+    path_c = cache.get(c)                       # 15 bytes > 10: a goes
+    assert not os.path.exists(path_a) and os.path.exists(path_b) and os.path.exists(path_c)
+
+
+def test_hits_do_not_touch_the_mezzanine_or_hash_it(cache, tmp_path, monkeypatch):
+    bg = source(tmp_path, 'bg.mp4', b'frames')
+    path = cache.get(bg)
+    mtime_ns = os.stat(path).st_mtime_ns
+    monkeypatch.setattr(ffmpeg_tools, '_hash_file', lambda path: pytest.fail(f'hashed {path}'))
+    ffmpeg_tools._digest.cache_clear()
+    assert cache.get(bg) == path
+    assert os.stat(path).st_mtime_ns == mtime_ns
+    # Identified by its cache key, so keyframe indexes etc. keyed on it never read it
+    assert len(file_digest(path)) == 64
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+import background_source
+from background_source import LoopingVideoClip, ScaledVideoClip
+from ffmpeg_tools import run_ffmpeg
+
+
+@pytest.fixture(scope='module')
+def one_second_clip(tmp_path_factory):
+    """30 distinct frames (testsrc draws a moving counter), with keyframes every 10 frames."""
+    path = str(tmp_path_factory.mktemp('bg') / 'loop.mp4')
+    run_ffmpeg(['-f', 'lavfi', '-i', 'testsrc=size=64x48:rate=30:duration=1',
+                '-c:v', 'libx264', '-g', '10', '-pix_fmt', 'yuv420p', path])
+    return path
+
+
+def read(clip, first, last):
+    return [clip.get_frame(i / 30).copy() for i in range(first, last)]
+
+
+def test_loop_wraps_to_the_first_frame(one_second_clip):
+    clip = LoopingVideoClip(one_second_clip, 3.0)
+    assert clip.loop_frames == 30
+    frames = read(clip, 0, 75)
+    assert not np.array_equal(frames[29], frames[0])
+    for i in range(30, 75):
+        assert np.array_equal(frames[i], frames[i % 30]), i
+
+
+@pytest.mark.parametrize('start', [1, 20, 29, 30, 41, 59])
+def test_reading_from_a_later_frame_matches_reading_from_zero(one_second_clip, start):
+    expected = read(LoopingVideoClip(one_second_clip, 3.0), 0, 75)
+    clip = LoopingVideoClip(one_second_clip, 3.0)
+    frames = read(clip, start, 75)
+    for i, frame in enumerate(frames, start):
+        assert np.array_equal(frame, expected[i]), i
+
+
+def test_clips_given_source_metadata_do_not_probe(one_second_clip, monkeypatch):
+    expected_loop = read(LoopingVideoClip(one_second_clip, 2.0), 0, 45)
+    expected_scaled = read(ScaledVideoClip(one_second_clip, (32, 24), start=0.5, duration=0.5), 0, 15)
+
+    def no_probe(path):
+        raise AssertionError(f"probed {path}")
+
+    monkeypatch.setattr(background_source, 'ffmpeg_parse_infos', no_probe)
+    loop = LoopingVideoClip(one_second_clip, 2.0, source_size=(64, 48), source_duration=1.0)
+    scaled = ScaledVideoClip(one_second_clip, (32, 24), start=0.5, duration=0.5, source_size=(64, 48))
+    for frame, want in zip(read(loop, 0, 45), expected_loop):
+        assert np.array_equal(frame, want)
+    for frame, want in zip(read(scaled, 0, 15), expected_scaled):
+        assert np.array_equal(frame, want)
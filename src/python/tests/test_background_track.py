@@ -0,0 +1,88 @@
+import os
+import random
+
+import pytest
+
+import render_profiles
+from background_cache import normalized_background
+from background_track import plan_segments, split_sources, write_concat_list
+from enhanced_generate_video import EnhancedVideoGenerator
+from enhanced_generate_video_v2 import EnhancedV2
+from ffmpeg_tools import run_ffmpeg
+from keyframe_index import KeyframeIndex
+
+
+def gop_index(duration, gop=2.0):
+    return KeyframeIndex([k * gop for k in range(int(duration // gop) + 1) if k * gop < duration], duration)
+
+
+@pytest.mark.parametrize('total', [0.5, 7.9, 30.0, 95.3])
+@pytest.mark.parametrize('switch_every', [2.0, 5.0, 8.0])
+def test_segments_cover_the_target_within_one_gop(total, switch_every):
+    indexes = [gop_index(20.0), gop_index(31.0), gop_index(12.5)]
+    segments = plan_segments(indexes, total, switch_every, random.Random('job'))
+    covered = sum(end - start for _, start, end in segments)
+    assert total <= covered < total + 2.0 + 1e-9
+    for i, start, end in segments:
+        assert start in indexes[i].keyframes
+        assert end in indexes[i].keyframes or end == indexes[i].duration
+        assert 0 <= start < end <= indexes[i].duration
+
+
+def test_plan_is_repeatable_per_seed_and_skips_empty_sources():
+    indexes = [gop_index(20.0), KeyframeIndex([], 0.0), gop_index(40.0)]
+    a = plan_segments(indexes, 60.0, 8.0, random.Random('job-1'))
+    assert a == plan_segments(indexes, 60.0, 8.0, random.Random('job-1'))
+    assert all(i != 1 for i, _, _ in a)
+    with pytest.raises(ValueError):
+        plan_segments([KeyframeIndex([], 0.0)], 10.0, 8.0)
+
+
+def test_concat_list_directives(tmp_path):
+    list_path = tmp_path / 'track.ffconcat'
+    write_concat_list(["/bg/it's.mp4"], [(0, 2.0000001, 6.0)], str(list_path), 30)
+    lines = list_path.read_text().splitlines()
+    assert lines[0] == 'ffconcat version 1.0'
+    assert lines[1] == "file '/bg/it'\\''s.mp4'"
+    assert lines[2:] == ['inpoint 2.000001', 'outpoint 5.983333', 'duration 4.000000']
+
+
+@pytest.fixture
+def clips(tmp_path, monkeypatch):
+    monkeypatch.setenv('RENDER_CACHE_DIR', str(tmp_path / 'cache'))
+    paths = []
+    for name, seconds in [('a.mp4', 6), ('b.mp4', 6)]:
+        path = str(tmp_path / name)
+        run_ffmpeg(['-f', 'lavfi', '-i', f'testsrc=size=128x96:rate=30:duration={seconds}', '-pix_fmt', 'yuv420p', path])
+        paths.append(path)
+    return paths + [str(tmp_path / 'missing.mp4')]
+
+
+def test_missing_entries_are_skipped(clips):
+    a, b, missing = clips
+    assert split_sources(os.pathsep.join([a, missing, b])) == [a, b]
+    assert split_sources(missing) == []
+
+
+def test_v2_plans_a_list_with_a_missing_entry_from_the_files_that_exist(clips):
+    a, b, missing = clips
+    gen = EnhancedV2('job-1')
+    single = gen.prepare_background(os.pathsep.join([missing, a]), 4.0, (72, 128))
+    assert single['source'] == normalized_background(a, (72, 128)) and not single['loop']
+    track = gen.prepare_background(os.pathsep.join([a, missing, b]), 4.0, (72, 128))
+    assert os.path.basename(track['source']).startswith('track-')
+    assert gen.prepare_background(missing, 4.0, (72, 128)) is None
+
+
+def test_v1_renders_a_list_with_a_missing_entry(clips, tmp_path, monkeypatch):
+    a, _, missing = clips
+    monkeypatch.setitem(render_profiles.PROFILES, 'tiny', render_profiles.RenderProfile('tiny', 72, 128, crf=30))
+    story = str(tmp_path / 'story.wav')
+    run_ffmpeg(['-f', 'lavfi', '-i', 'sine=frequency=440:duration=1', story])
+    out = tmp_path / 'out.mp4'
+    EnhancedVideoGenerator('job-1').generate_video(None, story, os.pathsep.join([missing, a]), 'no-banner.png',
+                                                   str(out), {}, 'no-alignment.json', profile='tiny')
+    assert out.stat().st_size > 0
+    with pytest.raises(FileNotFoundError):
+        EnhancedVideoGenerator('job-1').generate_video(None, story, missing, 'no-banner.png',
+                                                       str(out), {}, 'no-alignment.json', profile='tiny')
@@ -0,0 +1,52 @@
+import numpy as np
+
+from blend import blend_over, premultiply, unpremultiply
+
+
+def float_over(frame, rgba, pos):
+    """Straight-alpha float reference: dst = src * a + dst * (1 - a)."""
+    out = frame.astype(np.float64)
+    h, w = rgba.shape[:2]
+    x, y = pos
+    a = rgba[:, :, 3:4] / 255.0
+    out[y:y + h, x:x + w] = rgba[:, :, :3] * a + out[y:y + h, x:x + w] * (1 - a)
+    return out
+
+
+def test_blend_over_matches_float_reference():
+    rng = np.random.default_rng(3)
+    frame = rng.integers(0, 256, size=(40, 50, 3), dtype=np.uint8)
+    rgba = rng.integers(0, 256, size=(20, 30, 4), dtype=np.uint8)
+    expected = float_over(frame, rgba, (7, 9))
+    out = frame.copy()
+    blend_over(out, premultiply(rgba), (7, 9))
+    # Premultiplying rounds the colour once, the blend rounds once more
+    assert np.abs(out.astype(np.float64) - expected).max() <= 1.0
+    untouched = np.ones(frame.shape[:2], dtype=bool)
+    untouched[9:29, 7:37] = False
+    assert np.array_equal(out[untouched], frame[untouched])
+
+
+def test_opaque_and_transparent_pixels_are_exact():
+    frame = np.full((4, 4, 3), 77, dtype=np.uint8)
+    rgba = np.zeros((4, 4, 4), dtype=np.uint8)
+    rgba[:2] = (10, 200, 30, 255)
+    blend_over(frame, premultiply(rgba), (0, 0))
+    assert (frame[:2] == (10, 200, 30)).all()
+    assert (frame[2:] == 77).all()
+
+
+def test_sprite_is_clipped_to_the_frame():
+    frame = np.zeros((10, 10, 3), dtype=np.uint8)
+    rgba = np.full((6, 6, 4), 255, dtype=np.uint8)
+    blend_over(frame, rgba, (-3, 7))
+    assert frame[7:, :3].min() == 255
+    assert frame[:7].max() == 0 and frame[:, 3:].max() == 0
+    blend_over(frame, rgba, (20, 20))   # fully outside: no-op
+
+
+def test_unpremultiply_inverts_premultiply_for_opaque_pixels():
+    rng = np.random.default_rng(4)
+    rgba = rng.integers(0, 256, size=(8, 8, 4), dtype=np.uint8)
+    rgba[:, :, 3] = 255
+    assert np.array_equal(unpremultiply(premultiply(rgba)), rgba[:, :, :3])
@@ -0,0 +1,41 @@
+import numpy as np
+
+from blend import premultiply
+from caption_atlas import ATLAS_PADDING, CaptionAtlas, pack_rects
+
+
+def test_packed_rects_do_not_overlap_and_fit_the_atlas():
+    rng = np.random.default_rng(1)
+    sizes = [(int(w), int(h)) for w, h in rng.integers(1, 300, size=(200, 2))]
+    rects, width, height = pack_rects(sizes, width=1024)
+    for i, (x, y, w, h) in enumerate(rects):
+        assert (w, h) == sizes[i]
+        assert x >= 0 and y >= 0 and x + w <= width and y + h <= height
+    for i in range(len(rects)):
+        xi, yi, wi, hi = rects[i]
+        for j in range(i + 1, len(rects)):
+            xj, yj, wj, hj = rects[j]
+            # Padded rectangles must be disjoint so resampling never bleeds
+            assert (xi + wi + ATLAS_PADDING <= xj or xj + wj + ATLAS_PADDING <= xi or
+                    yi + hi + ATLAS_PADDING <= yj or yj + hj + ATLAS_PADDING <= yi)
+
+
+def test_sprite_wider_than_the_atlas_widens_it():
+    rects, width, _ = pack_rects([(3000, 10), (10, 10)], width=2048)
+    assert width >= 3000 and rects[0][2] == 3000
+
+
+def test_views_round_trip_the_premultiplied_sprites():
+    rng = np.random.default_rng(2)
+    sprites = [rng.integers(0, 256, size=(h, w, 4), dtype=np.uint8) for w, h in [(5, 7), (30, 3), (1, 1), (12, 12)]]
+    atlas = CaptionAtlas(sprites, width=32)
+    assert len(atlas) == len(sprites)
+    for i, sprite in enumerate(sprites):
+        view = atlas.view(i)
+        assert np.array_equal(view, premultiply(sprite))
+        assert np.shares_memory(view, atlas.pixels) and not view.flags.writeable
+
+
+def test_empty_atlas():
+    atlas = CaptionAtlas([])
+    assert len(atlas) == 0 and atlas.nbytes == 0
@@ -0,0 +1,43 @@
+import numpy as np
+
+from caption_track import CaptionTrack, prerender_bounce
+
+
+def track(words):
+    sprite = np.full((4, 6, 4), 255, dtype=np.uint8)
+    return CaptionTrack([(start, end, sprite) for start, end in words], (32, 32))
+
+
+def test_word_index_at_word_boundaries():
+    t = track([(1.0, 1.5), (0.0, 0.5), (0.5, 1.0), (2.0, 3.0)])   # unsorted input
+    assert t.word_index(-0.1) == -1
+    assert t.word_index(0.0) == 0            # start is inclusive
+    assert t.word_index(0.4999) == 0
+    assert t.word_index(0.5) == 1            # end is exclusive: the next word takes over
+    assert t.word_index(1.0) == 2
+    assert t.word_index(1.5) == -1           # gap between words
+    assert t.word_index(1.9999) == -1
+    assert t.word_index(2.0) == 3
+    assert t.word_index(3.0) == -1
+
+
+def test_repeated_sprites_are_packed_once():
+    sprite = np.full((4, 6, 4), 255, dtype=np.uint8)
+    t = CaptionTrack([(0, 1, sprite), (1, 2, sprite)], (32, 32))
+    assert len(t) == 2 and len(t.atlas) == 1
+
+
+def test_sprite_keys_are_stable_while_a_word_rests():
+    t = track([(0.0, 2.0)])
+    bounce = len(t.bounce_frames(0))
+    keys = [t.sprite_at(i / 30)[2] for i in range(60)]
+    assert keys[:bounce] == [(0, k) for k in range(bounce)]
+    assert set(keys[bounce:]) == {(0, -1)}
+    assert t.sprite_at(2.0) is None
+
+
+def test_bounce_ends_at_rest_scale():
+    sprite = np.full((10, 20, 4), 255, dtype=np.uint8)
+    frames = prerender_bounce(sprite, fps=30)
+    assert frames and frames[0].shape[1] > 20
+    assert [f.shape[1] for f in frames] == sorted((f.shape[1] for f in frames), reverse=True)
@@ -0,0 +1,90 @@
+import numpy as np
+
+from background_source import StaticFrameClip
+from blend import SpriteClip
+from caption_track import CaptionTrack
+from compositor import OverlayCompositor
+from frame_prefetch import PrefetchClip
+from frame_store import FrameArrayClip
+
+SIZE = (64, 48)
+FPS = 30
+
+
+def word_sprite(w=20, h=10, value=200):
+    rgba = np.full((h, w, 4), value, dtype=np.uint8)
+    rgba[:, :, 3] = 255
+    return rgba
+
+
+def render(compositor, n):
+    return [compositor.get_frame(i / FPS).copy() for i in range(n)]
+
+
+def test_held_word_over_static_background_is_reused():
+    background = StaticFrameClip(np.zeros((SIZE[1], SIZE[0], 3), dtype=np.uint8), 2.0)
+    track = CaptionTrack([(0.0, 2.0, word_sprite())], SIZE, bounce_scale=0.0)
+    compositor = OverlayCompositor(background, [track], SIZE)
+    frames = render(compositor, 60)
+    assert compositor.full_frames == 1
+    assert compositor.reused_frames == 59
+    assert all(np.array_equal(frames[0], f) for f in frames[1:])
+
+
+def test_bounce_frames_are_redrawn_then_reused():
+    background = StaticFrameClip(np.zeros((SIZE[1], SIZE[0], 3), dtype=np.uint8), 2.0)
+    track = CaptionTrack([(0.0, 2.0, word_sprite())], SIZE)
+    compositor = OverlayCompositor(background, [track], SIZE)
+    render(compositor, 60)
+    bounce = len(track.bounce_frames(0))
+    assert bounce > 0
+    assert compositor.full_frames + compositor.partial_frames == bounce + 1
+    assert compositor.reused_frames == 60 - bounce - 1
+
+
+def test_word_change_redraws_dirty_rects_only():
+    background = StaticFrameClip(np.zeros((SIZE[1], SIZE[0], 3), dtype=np.uint8), 2.0)
+    words = [(0.0, 1.0, word_sprite(value=100)), (1.0, 2.0, word_sprite(30, 8, value=50))]
+    compositor = OverlayCompositor(background, [CaptionTrack(words, SIZE, bounce_scale=0.0)], SIZE)
+    frames = render(compositor, 60)
+    assert (compositor.full_frames, compositor.partial_frames, compositor.reused_frames) == (1, 1, 58)
+    # The first word's rectangle is restored when the second word replaces it
+    expected = np.zeros((SIZE[1], SIZE[0], 3), dtype=np.uint8)
+    expected[20:28, 17:47] = 50
+    assert np.array_equal(frames[-1], expected)
+
+
+def test_frame_array_background_is_keyed_by_frame_index():
+    # A one-frame array wraps to the same frame every time; a two-frame array alternates
+    still = np.zeros((1, SIZE[1], SIZE[0], 3), dtype=np.uint8)
+    banner = SpriteClip(word_sprite(), (5, 5), 1.0)
+    compositor = OverlayCompositor(FrameArrayClip(still, FPS, 1.0), [banner], SIZE)
+    render(compositor, 10)
+    assert compositor.reused_frames == 9
+
+    moving = np.stack([np.zeros((SIZE[1], SIZE[0], 3), np.uint8), np.ones((SIZE[1], SIZE[0], 3), np.uint8)])
+    compositor = OverlayCompositor(FrameArrayClip(moving, FPS, 1.0), [banner], SIZE)
+    frames = render(compositor, 10)
+    assert compositor.reused_frames == 0
+    assert frames[1][0, 0, 0] == 1 and frames[2][0, 0, 0] == 0
+
+
+def test_prefetched_background_uses_source_frame_keys():
+    still = np.full((1, SIZE[1], SIZE[0], 3), 7, dtype=np.uint8)
+    background = PrefetchClip(FrameArrayClip(still, FPS, 1.0), fps=FPS, depth=4)
+    try:
+        compositor = OverlayCompositor(background, [SpriteClip(word_sprite(), (5, 5), 1.0)], SIZE)
+        frames = render(compositor, 20)
+        assert compositor.reused_frames == 19
+        assert frames[-1][0, 0, 0] == 7
+    finally:
+        background.close()
+
+
+def test_overlay_layer_is_cached_over_a_moving_background():
+    moving = np.stack([np.full((SIZE[1], SIZE[0], 3), v, np.uint8) for v in range(4)])
+    track = CaptionTrack([(0.0, 1.0, word_sprite()), (1.0, 2.0, word_sprite(value=90))], SIZE, bounce_scale=0.0)
+    compositor = OverlayCompositor(FrameArrayClip(moving, FPS, 2.0), [track], SIZE)
+    render(compositor, 60)
+    assert compositor.full_frames == 60
+    assert compositor.layer_builds == 2
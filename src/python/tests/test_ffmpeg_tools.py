@@ -0,0 +1,53 @@
+import hashlib
+import os
+
+import pytest
+
+import ffmpeg_tools
+from ffmpeg_tools import file_digest, mark_used, record_cache_entry
+
+
+def test_digest_is_persisted_and_rehashed_when_the_file_changes(tmp_path, monkeypatch):
+    monkeypatch.setenv('RENDER_CACHE_DIR', str(tmp_path / 'cache'))
+    source = tmp_path / 'bg.mp4'
+    source.write_bytes(b'first')
+    assert file_digest(str(source)) == hashlib.sha256(b'first').hexdigest()
+    assert len(os.listdir(tmp_path / 'cache' / 'digests')) == 1
+
+    # A new process (no memo) trusts the persisted digest while size and mtime match...
+    ffmpeg_tools._digest.cache_clear()
+    hashed = []
+    monkeypatch.setattr(ffmpeg_tools, '_hash_file', lambda path: hashed.append(path) or 'rehashed')
+    assert file_digest(str(source)) == hashlib.sha256(b'first').hexdigest()
+    assert hashed == []
+
+    # ...and rehashes once they change
+    source.write_bytes(b'second!')
+    assert file_digest(str(source)) == 'rehashed'
+    assert hashed == [os.path.realpath(source)]
+
+
+def test_marking_an_entry_used_keeps_its_digest_valid(tmp_path, monkeypatch):
+    monkeypatch.setenv('RENDER_CACHE_DIR', str(tmp_path / 'cache'))
+    entry = tmp_path / 'entry.mp4'
+    entry.write_bytes(b'mezzanine')
+    os.utime(entry, (1, 1))
+    digest = file_digest(str(entry))
+    ffmpeg_tools._digest.cache_clear()
+
+    mark_used(str(entry))
+    assert os.stat(entry).st_mtime == 1 and os.stat(entry).st_atime > 1
+    monkeypatch.setattr(ffmpeg_tools, '_hash_file', lambda path: pytest.fail('rehashed'))
+    assert file_digest(str(entry)) == digest
+
+
+def test_cache_entries_are_identified_by_their_key(tmp_path, monkeypatch):
+    monkeypatch.setenv('RENDER_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(ffmpeg_tools, '_hash_file', lambda path: pytest.fail('hashed a cache entry'))
+    a, b = tmp_path / 'a.mp4', tmp_path / 'b.mp4'
+    a.write_bytes(b'same bytes')
+    b.write_bytes(b'same bytes')
+    record_cache_entry(str(a), 'key-a')
+    record_cache_entry(str(b), 'key-b')
+    assert file_digest(str(a)) != file_digest(str(b))
+    assert file_digest(str(a)) == hashlib.sha256(b'cache-entry:key-a').hexdigest()
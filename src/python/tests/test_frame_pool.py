@@ -0,0 +1,37 @@
+import numpy as np
+
+import frame_pool
+from frame_pool import BackgroundFramePool
+
+
+def frames(n, value=0):
+    return np.full((n, 2, 2, 3), value, dtype=np.uint8)
+
+
+def test_lru_hits_misses_and_eviction():
+    pool = BackgroundFramePool(max_bytes=frames(2).nbytes * 2)
+    pool.put('a', frames(2))
+    pool.put('b', frames(2))
+    assert pool.get('a') is not None          # a is now most recently used
+    pool.put('c', frames(2))                  # over the cap: b is evicted
+    assert pool.get('b') is None
+    assert pool.get('a') is not None and pool.get('c') is not None
+    assert pool.evictions == 1 and pool.nbytes == frames(2).nbytes * 2
+
+
+def test_loading_locks_are_dropped_on_every_path(monkeypatch):
+    pool = BackgroundFramePool(max_bytes=10 ** 6)
+    monkeypatch.setattr(pool, 'key', lambda source, size, fps: source)
+    monkeypatch.setattr(frame_pool, 'ffmpeg_parse_infos', lambda source: {'duration': 1.0 if source != 'huge' else 1e6})
+    monkeypatch.setattr(frame_pool, 'decode_frames', lambda source, size, fps: frames(3))
+
+    assert pool.frames_for('ok', (2, 2), 1) is not None        # miss
+    assert pool.frames_for('ok', (2, 2), 1) is not None        # hit
+    assert pool.frames_for('huge', (2, 2), 1) is None          # too large
+    monkeypatch.setattr(frame_pool, 'decode_frames', lambda *a: (_ for _ in ()).throw(IOError('bad')))
+    try:
+        pool.frames_for('broken', (2, 2), 1)
+    except IOError:
+        pass
+    assert pool._loading == {}
+    assert (pool.hits, pool.misses, pool.skipped) == (1, 2, 1)
@@ -0,0 +1,39 @@
+import pytest
+
+import frame_store
+from ffmpeg_tools import run_ffmpeg
+from frame_store import FrameStore, MemmapVideoClip
+
+
+@pytest.fixture
+def clip(tmp_path, monkeypatch):
+    monkeypatch.setenv('RENDER_CACHE_DIR', str(tmp_path / 'cache'))
+    path = str(tmp_path / 'bg.mp4')
+    run_ffmpeg(['-f', 'lavfi', '-i', 'testsrc=size=64x48:rate=30:duration=1', '-pix_fmt', 'yuv420p', path])
+    return path
+
+
+def test_backgrounds_that_fit_are_predecoded(clip, tmp_path):
+    store = FrameStore(root=str(tmp_path), max_bytes=64 * 48 * 3 * 40)
+    path = store.get(clip, (64, 48), 30)
+    frames = MemmapVideoClip(path, 1.0)
+    assert len(frames.frames) == 30 and frames.get_frame(0).shape == (48, 64, 3)
+    assert store.get(clip, (64, 48), 30) == path and (store.hits, store.misses) == (1, 1)
+
+
+def test_backgrounds_too_large_for_the_store_are_never_decoded(clip, tmp_path, monkeypatch):
+    store = FrameStore(root=str(tmp_path), max_bytes=64 * 48 * 3 * 20)
+    monkeypatch.setattr(store, 'predecode', lambda *args: pytest.fail('predecoded'))
+    assert store.get(clip, (64, 48), 30) is None
+    assert store.skipped == 1 and store.misses == 0
+
+
+def test_an_hour_long_background_is_streamed(tmp_path, monkeypatch):
+    monkeypatch.setenv('RENDER_CACHE_DIR', str(tmp_path / 'cache'))
+    source = tmp_path / 'hour.mp4'
+    source.write_bytes(b'not decoded')
+    monkeypatch.setattr(frame_store, 'ffmpeg_parse_infos', lambda path: {'duration': 3600.0})
+    monkeypatch.setattr(frame_store, 'get_frame_store', lambda: FrameStore(root=str(tmp_path)))
+    # pytest.fail is not an Exception, so raw_frame_background cannot swallow it
+    monkeypatch.setattr(FrameStore, 'predecode', lambda *args: pytest.fail('predecoded'))
+    assert frame_store.raw_frame_background(str(source), (1080, 1920), 30) is None
@@ -0,0 +1,38 @@
+import random
+
+import keyframe_index
+from keyframe_index import KeyframeIndex, pick_background_offset
+
+
+def test_pick_segment_is_keyframe_aligned_and_fits():
+    index = KeyframeIndex([0.0, 2.0, 4.0, 6.0, 8.0], 10.0)
+    rng = random.Random(1)
+    for _ in range(100):
+        start = index.pick_segment(5.0, rng)
+        assert start in (0.0, 2.0, 4.0) and start + 5.0 <= index.duration
+    assert index.pick_segment(10.0) == 0.0
+    assert index.pick_segment(30.0) == 0.0
+
+
+def test_keyframe_lookup():
+    index = KeyframeIndex([0.0, 2.0, 4.0], 5.0)
+    assert index.keyframe_at_or_before(3.9) == 2.0
+    assert index.keyframe_at_or_after(2.0) == 2.0
+    assert index.keyframe_at_or_after(2.1) == 4.0
+    assert index.keyframe_at_or_after(4.5) == 5.0
+
+
+def test_background_offset_is_repeatable_per_seed(monkeypatch):
+    index = KeyframeIndex([float(k) for k in range(0, 600, 2)], 600.0)
+    monkeypatch.setattr(keyframe_index, 'get_keyframe_index', lambda path: index)
+    offsets = {pick_background_offset('bg.mp4', 60.0, seed='job-1') for _ in range(5)}
+    assert len(offsets) == 1 and offsets.pop() in index.keyframes
+    seeds = {pick_background_offset('bg.mp4', 60.0, seed=f'job-{i}') for i in range(20)}
+    assert len(seeds) > 1
+
+
+def test_background_offset_falls_back_to_zero(monkeypatch):
+    def broken(path):
+        raise IOError('no such file')
+    monkeypatch.setattr(keyframe_index, 'get_keyframe_index', broken)
+    assert pick_background_offset('missing.mp4', 10.0, seed='x') == 0.0
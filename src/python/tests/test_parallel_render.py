@@ -0,0 +1,89 @@
+import json
+import subprocess
+import wave
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import render_profiles
+from enhanced_generate_video_v2 import EnhancedV2
+from ffmpeg_tools import ffmpeg_binary, run_ffmpeg
+from parallel_render import chunk_encoder, chunk_ranges
+
+
+@pytest.mark.parametrize('n_frames', [1, 2, 29, 30, 121, 1800])
+@pytest.mark.parametrize('chunks', [1, 2, 3, 7, 16])
+def test_chunk_ranges_cover_all_frames_without_gaps(n_frames, chunks):
+    ranges = chunk_ranges(n_frames, chunks)
+    assert ranges[0][0] == 0 and ranges[-1][1] == n_frames
+    assert all(prev[1] == nxt[0] for prev, nxt in zip(ranges, ranges[1:]))
+    assert all(last > first for first, last in ranges)
+    assert len(ranges) == min(chunks, n_frames)
+    sizes = [last - first for first, last in ranges]
+    assert max(sizes) - min(sizes) <= 1
+
+
+def test_chunk_encoder_is_video_only_with_closed_gops():
+    encoder = {'codec': 'libx264', 'faststart': True, 'audio_bitrate': '192k', 'extra_args': ['-x']}
+    chunk = chunk_encoder(encoder, 4)
+    assert 'audio_bitrate' not in chunk and chunk['faststart'] is False
+    assert chunk['extra_args'] == ['-x', '-flags', '+cgop'] and chunk['threads'] >= 1
+    assert encoder['extra_args'] == ['-x']
+
+
+def write_tone(path, seconds, rate=44100):
+    samples = (np.sin(np.arange(int(seconds * rate)) * 2 * np.pi * 440 / rate) * 8000).astype(np.int16)
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(samples.tobytes())
+
+
+def decode(path, size):
+    w, h = size
+    raw = subprocess.run([ffmpeg_binary(), '-v', 'error', '-i', str(path), '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-'],
+                         capture_output=True, check=True).stdout
+    return np.frombuffer(raw, dtype=np.uint8).reshape(-1, h, w, 3)
+
+
+@pytest.fixture(scope='module')
+def job(tmp_path_factory):
+    """A 168-frame job (1 s title + 4.6 s story) with captions, a banner and a background to loop or seek into."""
+    root = tmp_path_factory.mktemp('job')
+    write_tone(root / 'title.wav', 1.0)
+    write_tone(root / 'story.wav', 4.6)
+    words = 'I told my friend that I would never ever tell anyone about it'.split()
+    (root / 'align.json').write_text(json.dumps(
+        [{'word': word, 'start': i * 0.35, 'end': i * 0.35 + 0.3} for i, word in enumerate(words)]))
+    banner = np.zeros((40, 120, 4), dtype=np.uint8)
+    banner[..., 0] = banner[..., 3] = 200
+    Image.fromarray(banner).save(root / 'banner.png')
+    for name, seconds in [('short.mp4', 3), ('long.mp4', 12)]:
+        run_ffmpeg(['-f', 'lavfi', '-i', f'testsrc=size=320x240:rate=30:duration={seconds}',
+                    '-c:v', 'libx264', '-g', '30', '-pix_fmt', 'yuv420p', str(root / name)])
+    return root
+
+
+@pytest.mark.parametrize('background', ['short.mp4', 'long.mp4'])
+@pytest.mark.parametrize('caption_backend', ['moviepy', 'ass'])
+def test_chunked_render_matches_single_process_render(job, tmp_path, monkeypatch, background, caption_backend):
+    monkeypatch.setenv('RENDER_CACHE_DIR', str(tmp_path / 'cache'))
+    # Lossless, so any difference between the renders is a difference in the composited frames
+    monkeypatch.setitem(render_profiles.PROFILES, 'lossless',
+                        render_profiles.RenderProfile('lossless', 180, 320, preset='ultrafast', crf=0))
+    outputs = {}
+    for workers in (1, 2, 3):
+        out = tmp_path / f'out{workers}.mp4'
+        EnhancedV2('job-1').generate(str(job / 'title.wav'), str(job / 'story.wav'), str(job / background),
+                                     str(job / 'banner.png'), str(out), str(job / 'align.json'),
+                                     caption_backend=caption_backend, profile='lossless', workers=workers)
+        outputs[workers] = decode(out, (180, 320))
+    single = outputs[1]
+    assert len(single) == 168
+    for workers in (2, 3):
+        chunked = outputs[workers]
+        assert len(chunked) == len(single)
+        differing = [i for i in range(len(single)) if not np.array_equal(single[i], chunked[i])]
+        assert differing == [], f"{workers} workers"
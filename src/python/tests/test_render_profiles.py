@@ -0,0 +1,26 @@
+import pytest
+
+from render_profiles import get_profile
+
+# What each script encoded its output with before render profiles existed
+BASELINE_FINAL = {
+    'generate_video': {'codec': 'libx264', 'preset': 'medium', 'bitrate': '8000k', 'audio_bitrate': '192k'},
+    'enhanced_generate_video': {'codec': 'libx264', 'preset': 'medium', 'bitrate': '6000k', 'audio_bitrate': '192k'},
+    'enhanced_generate_video_v2': {'codec': 'libx264', 'preset': 'medium', 'bitrate': '6000k', 'audio_bitrate': '192k'},
+}
+
+
+@pytest.mark.parametrize('script', sorted(BASELINE_FINAL))
+def test_final_profile_keeps_each_scripts_encoder_settings(script):
+    render = get_profile('final', script=script)
+    assert render.size == (1080, 1920) and render.bounce
+    encoder = render.encoder()
+    assert {k: encoder[k] for k in BASELINE_FINAL[script]} == BASELINE_FINAL[script]
+    assert encoder['crf'] is None
+
+
+def test_script_bitrates_do_not_leak_into_other_profiles():
+    assert get_profile('final', script='generate_video').bitrate == '8000k'
+    assert get_profile('final').bitrate == '6000k'
+    assert get_profile('preview', script='generate_video').encoder() == get_profile('preview').encoder()
+    assert get_profile('nonsense', script='generate_video').bitrate == '8000k'
@@ -0,0 +1,86 @@
+import os
+import time
+
+import pytest
+
+import segment_cache
+from segment_cache import SegmentCache, narration_track
+
+OPENING = {'version': 2, 'opening_audio': 'a' * 64, 'banner': 'b' * 64, 'background': 'c' * 64,
+           'profile': 'final', 'size': [1080, 1920], 'fps': 30, 'encoder': {'preset': 'medium'}, 'offset': 4.0}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SegmentCache(root=str(tmp_path), max_bytes=10)
+
+
+def test_key_changes_with_every_input(cache):
+    keys = {cache.key('opening', OPENING)}
+    for name, value in [('version', 3), ('opening_audio', 'd' * 64), ('banner', None), ('background', 'e' * 64),
+                        ('profile', 'preview'), ('size', [540, 960]), ('fps', 60),
+                        ('encoder', {'preset': 'fast'}), ('offset', 6.0)]:
+        keys.add(cache.key('opening', dict(OPENING, **{name: value})))
+    assert len(keys) == 10
+    assert cache.key('story', OPENING) != cache.key('opening', OPENING)
+    # Dict order does not matter
+    assert cache.key('opening', dict(reversed(list(OPENING.items())))) == cache.key('opening', OPENING)
+
+
+def test_get_renders_once_then_hits(cache):
+    calls = []
+
+    def render(path):
+        calls.append(path)
+        with open(path, 'wb') as f:
+            f.write(b'1234')
+
+    first = cache.get('opening-x', render)
+    assert cache.get('opening-x', render) == first
+    assert len(calls) == 1 and '.partial' in calls[0]
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert [name for name in os.listdir(cache.root) if '.partial' in name] == []
+
+
+def test_failed_render_leaves_nothing_behind(cache):
+    def render(path):
+        open(path, 'wb').close()
+        raise RuntimeError('encoder failed')
+
+    with pytest.raises(RuntimeError):
+        cache.get('opening-y', render)
+    assert os.listdir(cache.root) == []
+
+
+def test_least_recently_used_segments_are_evicted(cache):
+    def write(path):
+        with open(path, 'wb') as f:
+            f.write(b'12345')
+
+    a = cache.get('a', write)
+    os.utime(a, (time.time() - 100, time.time() - 100))
+    b = cache.get('b', write)
+    os.utime(b, (time.time() - 50, time.time() - 50))
+    c = cache.get('c', write)                    # 15 bytes > 10: a goes
+    assert not os.path.exists(a) and os.path.exists(b) and os.path.exists(c)
+
+
+def test_narration_key_follows_audio_contents_and_order(tmp_path, monkeypatch):
+    monkeypatch.setenv('RENDER_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(segment_cache, 'get_segment_cache', lambda: SegmentCache(root=str(tmp_path)))
+    monkeypatch.setattr(segment_cache, 'encode_audio', lambda audio, path, fps, bitrate: open(path, 'wb').close())
+    title, story = tmp_path / 'title.wav', tmp_path / 'story.wav'
+    title.write_bytes(b'title')
+    story.write_bytes(b'story')
+    paths = {
+        narration_track([str(title), str(story)], lambda: None),
+        narration_track([str(story), str(title)], lambda: None),
+        narration_track([str(story)], lambda: None),
+        narration_track([str(title), str(story)], lambda: None, bitrate='96k'),
+        narration_track([str(title), str(story)], lambda: None, variant='normalized'),
+    }
+    assert len(paths) == 5
+    # Same bytes under another name hit the same entry
+    copy = tmp_path / 'retake.wav'
+    copy.write_bytes(b'story')
+    assert narration_track([str(title), str(copy)], lambda: None) == narration_track([str(title), str(story)], lambda: None)
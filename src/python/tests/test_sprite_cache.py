@@ -0,0 +1,43 @@
+import numpy as np
+
+from sprite_cache import WordSpriteCache, make_sprite_key
+
+
+def sprite():
+    return np.zeros((2, 2, 4), dtype=np.uint8)
+
+
+def test_lru_hits_misses_and_eviction():
+    cache = WordSpriteCache(max_entries=2)
+    rendered = []
+    render = lambda: rendered.append(1) or sprite()
+    a = cache.get_or_render('a', render)
+    cache.get_or_render('b', render)
+    assert cache.get_or_render('a', render) is a    # hit, a becomes most recent
+    cache.get_or_render('c', render)                # evicts b
+    assert cache.get('b') is None
+    assert cache.get('a') is a
+    assert len(rendered) == 3 and len(cache) == 2
+    assert (cache.hits, cache.misses, cache.evictions) == (2, 4, 1)
+
+
+def test_cached_sprites_are_read_only():
+    cache = WordSpriteCache()
+    assert not cache.put('a', sprite()).flags.writeable
+
+
+def test_sprite_key_changes_with_every_input():
+    base = ('word', '/fonts/a.ttf', 75, '#FFFFFF', '#000000', 4)
+    variants = [
+        ('Word', '/fonts/a.ttf', 75, '#FFFFFF', '#000000', 4),
+        ('word', '/fonts/b.ttf', 75, '#FFFFFF', '#000000', 4),
+        ('word', '/fonts/a.ttf', 76, '#FFFFFF', '#000000', 4),
+        ('word', '/fonts/a.ttf', 75, '#FFFF00', '#000000', 4),
+        ('word', '/fonts/a.ttf', 75, '#FFFFFF', '#111111', 4),
+        ('word', '/fonts/a.ttf', 75, '#FFFFFF', '#000000', 5),
+    ]
+    keys = {make_sprite_key(*base)} | {make_sprite_key(*v) for v in variants}
+    assert len(keys) == len(variants) + 1
+    # Equivalent spellings of the same sprite share a key
+    assert make_sprite_key(' word ', '/fonts/a.ttf', 75.0, '#ffffff', '#000000', 4) == make_sprite_key(*base)
+    assert make_sprite_key('é', None, 75, '#FFF', '#000', 4) == make_sprite_key('é', None, 75, '#FFF', '#000', 4)